@@ -0,0 +1 @@
+# Benchmarks of process-plot's own sampling, writing and rendering paths
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+# Metrics where a larger value is better; for every other metric (times,
+# latencies, memory, overhead) smaller is better.
+HIGHER_IS_BETTER = {'rows_per_s', 'mb_per_s', 'ticks_per_s'}
+GROUPS = ('sample', 'monitor', 'write', 'render')
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+def cmd_run(args):
+    """Run the benchmark suite and write its results as JSON"""
+    from .suite import run_suite
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='process-plot-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = run_suite(args.profile, workdir, args.only)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump({
+            'bench_version': 1,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'profile': args.profile,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'results': results,
+        }, f, indent=1)
+    print(f"Results written to {output}")
+
+def _key(entry):
+    return entry['name'], json.dumps(entry['params'], sort_keys=True)
+
+def cmd_compare(args):
+    """Print how each metric changed between two results files"""
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    before = {_key(entry): entry for entry in old['results']}
+    rows = []
+    worse = 0
+    for entry in new['results']:
+        previous = before.get(_key(entry))
+        if previous is None:
+            continue
+        for metric, value in entry['metrics'].items():
+            was = previous['metrics'].get(metric)
+            if not was:
+                continue
+            change = (value - was) / was * 100
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            flag = ''
+            if abs(change) >= args.threshold:
+                flag = 'better' if better else 'WORSE'
+                worse += not better
+            rows.append([entry['name'], _key(entry)[1], metric, f"{was:.4g}", f"{value:.4g}", f"{change:+.1f}%", flag])
+    headers = ['Benchmark', 'Params', 'Metric', 'Old', 'New', 'Change', '']
+    widths = [max(len(cell) for cell in column) for column in zip(headers, *rows)]
+    for line in [headers] + rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(line, widths)))
+    print(f"{worse} metric(s) worse by {args.threshold:g}% or more")
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench', description="Benchmark process-plot's own sampling, writing and rendering")
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument('--profile', choices=('quick', 'full'), default='quick', help='quick takes a few minutes; full goes up to 1000-process trees and 10M-row traces')
+    run_parser.add_argument('--only', choices=GROUPS, action='append', help='Run only this group of benchmarks (repeatable)')
+    run_parser.add_argument('--output', help='JSON file for the results (default: bench_<date>.json)')
+    run_parser.add_argument('--workdir', help='Directory for generated traces, kept so that later runs reuse them (default: a temporary directory)')
+    run_parser.set_defaults(func=cmd_run)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two results files')
+    compare_parser.add_argument('old', help='Results of the earlier version')
+    compare_parser.add_argument('new', help='Results of the later version')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help='Flag changes of at least this many percent')
+    compare_parser.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+
+    if not hasattr(args, 'func'):
+        parser.print_help()
+        sys.exit(2)
+
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import json
+import resource
+import sys
+import time
+
+# Renders one comparison in a fresh interpreter and prints its cost as JSON,
+# so that the peak RSS of each render is its own and not the suite's.
+
+def main():
+    input_file, output_file = sys.argv[1:3]
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.plots import render_comparison_plot
+    imported = time.perf_counter()
+    if not render_comparison_plot(input_file, output_file):
+        sys.exit(1)
+    done = time.perf_counter()
+    scale = 1 if sys.platform == 'darwin' else 1024
+    print(json.dumps({
+        'import_s': imported - start,
+        'render_s': done - imported,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024),
+    }))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import psutil
+
+from src.process_plot import COMPARE_COLUMNS, MONITOR_COLUMNS, write_header, write_metrics_to_csv
+from src.sampler import make_sampler
+from src.segments import SegmentWriter, write_manifest_header
+from src.trace import TraceWriter, write_trace_header
+from src.writer import RowWriter
+
+from .synthetic import start_tree, stop_tree, write_comparison_trace
+
+# Each benchmark returns result dicts {"name": ..., "params": {...},
+# "metrics": {...}}; a (name, params) pair identifies a result across runs,
+# so results of two versions can be compared metric by metric.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    'quick': {
+        'trees': [(10, 0.0, 'flat'), (100, 0.0, 'ramp'), (100, 10.0, 'sawtooth')],
+        'samplers': ['procfs', 'psutil'],
+        'tiers': ['basic'],
+        'ticks': 100,
+        'monitor_seconds': 3.0,
+        'write_rows': 100000,
+        'render_rows': [1000, 100000, 1000000],
+        'render_commands': [2],
+    },
+    'full': {
+        'trees': [(10, 0.0, 'flat'), (100, 0.0, 'ramp'), (100, 10.0, 'sawtooth'), (500, 0.0, 'flat'), (1000, 20.0, 'spike')],
+        'samplers': ['procfs', 'psutil'],
+        'tiers': ['basic', 'expensive'],
+        'ticks': 300,
+        'monitor_seconds': 10.0,
+        'write_rows': 1000000,
+        'render_rows': [1000, 10000, 100000, 1000000, 10000000],
+        'render_commands': [2, 8],
+    },
+}
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+def result(name, params, metrics):
+    return {'name': name, 'params': params, 'metrics': metrics}
+
+def bench_sample_latency(tree, sampler, tier, ticks, interval=0.01):
+    """Per-tick cost of one sampler on a running synthetic tree"""
+    children, churn, ramp = tree
+    # Stopped once the ticks are done, however long they take
+    proc = start_tree(children, churn, ramp, duration=3600)
+    try:
+        tree_sampler = make_sampler(sampler, psutil.Process(proc.pid), tier=tier)
+        tree_sampler.sample()
+        latencies = []
+        for _ in range(ticks):
+            start = time.perf_counter()
+            tree_sampler.sample()
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(interval)
+        tree_sampler.close()
+    finally:
+        stop_tree(proc)
+    return result('sample_latency', {'children': children, 'churn': churn, 'ramp': ramp, 'sampler': sampler, 'tier': tier}, {
+        'mean_ms': statistics.fmean(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    })
+
+def bench_monitor_overhead(tree, sampler, seconds, workdir, interval=0.01):
+    """CPU used by the whole monitor loop, writer thread included, while it watches a tree"""
+    children, churn, ramp = tree
+    output = os.path.join(workdir, 'monitor.csv')
+    write_header(output, MONITOR_COLUMNS)
+    proc = start_tree(children, churn, ramp, duration=seconds)
+    start_wall = time.perf_counter()
+    start_cpu = sum(os.times()[:2])
+    with contextlib.redirect_stdout(io.StringIO()):
+        thread = threading.Thread(target=write_metrics_to_csv, args=(psutil.Process(proc.pid), interval, output), kwargs={'start_time': datetime.now(), 'sampler': sampler})
+        thread.start()
+        # Reaping the tree's root is what lets the sampling loop see it exit
+        proc.wait()
+        thread.join()
+    cpu = sum(os.times()[:2]) - start_cpu
+    wall = time.perf_counter() - start_wall
+    stop_tree(proc)
+    with open(output) as f:
+        rows = sum(1 for _ in f) - 1
+    os.remove(output)
+    return result('monitor_overhead', {'children': children, 'churn': churn, 'ramp': ramp, 'sampler': sampler, 'interval': interval}, {
+        'monitor_cpu_percent': cpu / wall * 100,
+        'cpu_ms_per_tick': cpu / max(rows, 1) * 1000,
+        'ticks_per_s': rows / wall,
+    })
+
+def _writer(kind, path):
+    """A writer of kind for path, with a queue deep enough never to drop a row"""
+    if kind == 'binary':
+        write_trace_header(path, COMPARE_COLUMNS, ['bench'])
+        return TraceWriter(path, max_queue=0)
+    if kind == 'gzip':
+        write_manifest_header(path, COMPARE_COLUMNS, ['bench'], compression='gzip')
+        return SegmentWriter(path, max_queue=0)
+    write_header(path, COMPARE_COLUMNS)
+    return RowWriter(path, max_queue=0)
+
+def _output_bytes(kind, path):
+    if kind != 'gzip':
+        return os.path.getsize(path)
+    directory = os.path.dirname(path)
+    base = os.path.basename(path)[:-len('.manifest.json')]
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if name.startswith(f"{base}."))
+
+def bench_write_throughput(kind, rows, workdir):
+    """Rows per second through a writer thread, and what enqueueing costs the sampler"""
+    path = os.path.join(workdir, 'write.manifest.json' if kind == 'gzip' else f'write.{kind}')
+    writer = _writer(kind, path)
+    row = [1.5, 42.0, 512.25, 'bench', 0.12, 1, 0.4, 0.1, 530.0, 12.5]
+    start = time.perf_counter()
+    for i in range(rows):
+        row[0] = i * 0.1
+        writer.writerow(list(row))
+    enqueued = time.perf_counter() - start
+    writer.close()
+    elapsed = time.perf_counter() - start
+    size = _output_bytes(kind, path)
+    for name in os.listdir(workdir):
+        if name.startswith('write.'):
+            os.remove(os.path.join(workdir, name))
+    return result('write_throughput', {'format': kind, 'rows': rows}, {
+        'rows_per_s': rows / elapsed,
+        'mb_per_s': size / (1024 * 1024) / elapsed,
+        'enqueue_us_per_row': enqueued / rows * 1e6,
+        'bytes_per_row': size / rows,
+    })
+
+def bench_render(rows, commands, workdir):
+    """Wall time and peak memory of render_comparison_plot, in a fresh process each time"""
+    trace = os.path.join(workdir, f'trace_{rows}_{commands}.csv')
+    if not os.path.exists(trace):
+        write_comparison_trace(trace, rows, commands)
+    output = os.path.join(workdir, 'render.png')
+    out = subprocess.run([sys.executable, '-m', 'bench.render_worker', trace, output], cwd=ROOT, capture_output=True, text=True, check=True)
+    metrics = json.loads(out.stdout.strip().splitlines()[-1])
+    os.remove(output)
+    return result('render', {'rows': rows, 'commands': commands}, metrics)
+
+def run_suite(profile, workdir, only=None, progress=print):
+    """Run the benchmarks of a profile; only limits them to the named groups"""
+    settings = PROFILES[profile]
+    groups = only or ['sample', 'monitor', 'write', 'render']
+    results = []
+
+    def record(entry):
+        results.append(entry)
+        progress(f"{entry['name']} {json.dumps(entry['params'])}: " + ', '.join(f"{k}={v:.4g}" for k, v in entry['metrics'].items()))
+
+    if 'sample' in groups:
+        for tree in settings['trees']:
+            for sampler in settings['samplers']:
+                for tier in settings['tiers']:
+                    record(bench_sample_latency(tree, sampler, tier, settings['ticks']))
+    if 'monitor' in groups:
+        for tree in settings['trees']:
+            for sampler in settings['samplers']:
+                record(bench_monitor_overhead(tree, sampler, settings['monitor_seconds'], workdir))
+    if 'write' in groups:
+        for kind in ('csv', 'binary', 'gzip'):
+            record(bench_write_throughput(kind, settings['write_rows'], workdir))
+    if 'render' in groups:
+        for commands in settings['render_commands']:
+            for rows in settings['render_rows']:
+                record(bench_render(rows, commands, workdir))
+    return results
@@ -0,0 +1,162 @@
+import argparse
+import os
+import signal
+import sys
+import time
+
+# Synthetic workloads for the benchmarks: a process tree whose size, churn
+# and memory pattern are chosen up front, and comparison traces of any size.
+# The tree is run as `python -m bench.synthetic` so the sampler under test
+# watches a real, separate process tree.
+
+RAMPS = ('flat', 'ramp', 'sawtooth', 'spike')
+CHUNK_BYTES = 256 * 1024
+
+def target_bytes(ramp, peak_bytes, elapsed, duration):
+    """The memory a child should hold elapsed seconds into its life"""
+    if ramp == 'flat':
+        return peak_bytes
+    if ramp == 'ramp':
+        return int(peak_bytes * min(1.0, elapsed / max(duration, 1e-9)))
+    if ramp == 'sawtooth':
+        return int(peak_bytes * (elapsed % 2.0) / 2.0)
+    # spike: a quarter of the peak, with the full peak for 0.1 s every second
+    return peak_bytes if elapsed % 1.0 < 0.1 else peak_bytes // 4
+
+def run_child(ramp, peak_bytes, duration, tick=0.05):
+    """Hold memory along ramp, touching every page, until killed or duration passes"""
+    chunks = []
+    start = time.monotonic()
+    while True:
+        elapsed = time.monotonic() - start
+        if elapsed >= duration:
+            break
+        wanted = target_bytes(ramp, peak_bytes, elapsed, duration) // CHUNK_BYTES
+        while len(chunks) < wanted:
+            chunks.append(bytearray(CHUNK_BYTES))
+        del chunks[wanted:]
+        time.sleep(tick)
+    os._exit(0)
+
+def fork_child(ramp, peak_bytes, duration):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        run_child(ramp, peak_bytes, duration)
+    return pid
+
+def run_tree(children, churn, ramp, child_mb, duration):
+    """Keep children forked children alive for duration seconds
+
+    churn is the number of children replaced per second, oldest first, so
+    the sampler keeps meeting new pids. Forked children share the parent's
+    interpreter pages, so even a thousand of them are cheap to start.
+    """
+    peak_bytes = int(child_mb * 1024 * 1024)
+    pids = [fork_child(ramp, peak_bytes, duration) for _ in range(children)]
+    # start_tree waits for this line
+    print('ready', flush=True)
+    start = time.monotonic()
+    replaced = 0
+    try:
+        while time.monotonic() - start < duration:
+            time.sleep(0.02)
+            due = int((time.monotonic() - start) * churn) - replaced
+            for _ in range(min(due, len(pids))):
+                old = pids.pop(0)
+                os.kill(old, signal.SIGKILL)
+                os.waitpid(old, 0)
+                pids.append(fork_child(ramp, peak_bytes, duration))
+                replaced += 1
+            # Reap children that ran out their duration
+            while pids:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                if pid in pids:
+                    pids.remove(pid)
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+def start_tree(children, churn=0.0, ramp='flat', child_mb=1.0, duration=10.0):
+    """Launch a synthetic tree and wait until all its children exist; returns the Popen
+
+    duration counts from then, so a large tree's start-up does not eat
+    into it.
+    """
+    import subprocess
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([
+        sys.executable, '-m', 'bench.synthetic',
+        '--children', str(children), '--churn', str(churn), '--ramp', ramp,
+        '--child-mb', str(child_mb), '--duration', str(duration),
+    ], cwd=root, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()
+    return proc
+
+def stop_tree(proc):
+    proc.terminate()
+    proc.wait()
+    proc.stdout.close()
+
+def write_comparison_trace(path, rows, commands=2, interval=0.1, seed=0, chunk_rows=1000000):
+    """Write a comparison CSV of rows samples split evenly over commands
+
+    Each command ramps and saws its memory with noise and occasional
+    spikes, so downsampling has real extremes to keep. Rows are generated
+    and written a chunk at a time, so ten million rows need no more memory
+    than one chunk.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from src.process_plot import COMPARE_COLUMNS
+
+    rng = np.random.default_rng(seed)
+    per_command = rows // commands
+    first = True
+    for k in range(commands):
+        label = f"command {k + 1}"
+        base = 50.0 * (k + 1)
+        for offset in range(0, per_command, chunk_rows):
+            n = min(chunk_rows, per_command - offset)
+            index = np.arange(offset, offset + n)
+            seconds = index * interval
+            memory = base + 0.001 * index + 20 * ((index % 5000) / 5000) + rng.normal(0, 1, n)
+            memory[rng.random(n) < 0.0005] += 200
+            cpu = np.clip(rng.normal(80, 15, n), 0, None)
+            df = pd.DataFrame({
+                'seconds_elapsed': seconds,
+                'cpu_percent': cpu,
+                'memory_mb': memory,
+                'command': label,
+                'sample_ms': rng.gamma(2.0, 0.1, n),
+                'trial': 1,
+                'monitor_cpu_percent': rng.gamma(2.0, 0.3, n),
+                'interval_s': interval,
+                'peak_hwm_mb': np.maximum.accumulate(memory),
+                'cpu_seconds': np.cumsum(cpu) * interval / 100,
+            }, columns=COMPARE_COLUMNS)
+            df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+            first = False
+    return per_command * commands
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a synthetic process tree for the benchmarks')
+    parser.add_argument('--children', type=int, default=10, help='Number of forked children kept alive')
+    parser.add_argument('--churn', type=float, default=0.0, help='Children replaced per second')
+    parser.add_argument('--ramp', choices=RAMPS, default='flat', help='Memory pattern of each child')
+    parser.add_argument('--child-mb', type=float, default=1.0, help='Peak memory of each child in MB')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+    args = parser.parse_args()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    run_tree(args.children, args.churn, args.ramp, args.child_mb, args.duration)
+
+if __name__ == '__main__':
+    main()
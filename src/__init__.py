@@ -1 +1,8 @@
-# Process Plot Package
\ No newline at end of file
+# Process Plot Package
+
+def __getattr__(name):
+    # Imported on first use, so the command line does not pay for NumPy here
+    if name in ('Monitor', 'MonitorResult'):
+        from . import inprocess
+        return getattr(inprocess, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
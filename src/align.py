@@ -0,0 +1,98 @@
+import warnings
+
+import numpy as np
+
+# Grid points of an aligned comparison. The delta and memory-time panels are
+# smooth curves, so they need far fewer points than the raw traces get
+GRID_POINTS = 2000
+
+def split_runs(df, column='memory_mb'):
+    """Split a comparison frame into {command: [(seconds, values), ...]} in one groupby pass
+
+    Commands keep their order of first appearance and trials their order
+    within each command; the arrays are views of the frame's columns.
+    """
+    keys = ['command', 'trial'] if 'trial' in df.columns else ['command']
+    seconds = df['seconds_elapsed'].to_numpy(dtype=np.float64)
+    values = df[column].to_numpy(dtype=np.float64)
+    groups = df.groupby(keys, sort=False, observed=True).indices
+    runs = {}
+    for key, index in sorted(groups.items(), key=lambda item: item[1][0]):
+        command = key[0] if isinstance(key, tuple) else key
+        runs.setdefault(command, []).append((seconds[index], values[index]))
+    return runs
+
+def common_grid(runs, max_points=GRID_POINTS):
+    """Evenly spaced times from 0 to the end of the longest run
+
+    The spacing is the typical sampling interval, so no run is smoothed
+    more than its own sampling already does, but there are never more than
+    max_points grid points.
+    """
+    ends = [t[-1] for trials in runs.values() for t, _ in trials if len(t)]
+    steps = [np.median(np.diff(t)) for trials in runs.values() for t, _ in trials if len(t) > 1]
+    end = max(ends, default=0.0)
+    step = float(np.median(steps)) if steps else end
+    points = int(end / step) + 1 if step > 0 else 1
+    return np.linspace(0.0, end, max(2, min(points, max_points)))
+
+def cumulative_integral(t, y):
+    """Running trapezoidal integral of y over t, starting at 0"""
+    out = np.zeros(len(y))
+    if len(y) > 1:
+        np.cumsum(np.diff(t) * (y[1:] + y[:-1]) / 2, out=out[1:])
+    return out
+
+def resample(trials, grid, hold_last=False):
+    """Interpolate each (t, y) trial onto grid, one row per trial
+
+    Before its first sample a trial holds its first value. After its last
+    sample it is NaN, since the run is over, unless hold_last keeps the
+    final value, which suits running totals.
+    """
+    matrix = np.full((len(trials), len(grid)), np.nan)
+    for row, (t, y) in enumerate(trials):
+        if len(t):
+            matrix[row] = np.interp(grid, t, y, right=y[-1] if hold_last else np.nan)
+    return matrix
+
+def envelope(matrix):
+    """(min, median, max) across the trials of a resampled matrix, ignoring finished runs"""
+    with warnings.catch_warnings():
+        # Grid points after every trial ended are all-NaN, which is expected
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmin(matrix, axis=0), np.nanmedian(matrix, axis=0), np.nanmax(matrix, axis=0)
+
+def align_comparison(runs, max_points=GRID_POINTS):
+    """Put the runs of a comparison (from split_runs) on a common time grid and derive comparison curves
+
+    Returns a dict with the grid, the command order, and per command the
+    envelope of the value and of its cumulative integral (value-seconds,
+    e.g. MB*s), as (min, median, max) tuples. It also holds delta and
+    ratio of each command's median against the first command's.
+    """
+    grid = common_grid(runs, max_points)
+    commands = list(runs)
+    values = {}
+    integrals = {}
+    for command, trials in runs.items():
+        values[command] = envelope(resample(trials, grid))
+        totals = [(t, cumulative_integral(t, y)) for t, y in trials]
+        integrals[command] = envelope(resample(totals, grid, hold_last=True))
+
+    baseline = values[commands[0]][1]
+    delta = {}
+    ratio = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for command in commands[1:]:
+            median = values[command][1]
+            delta[command] = median - baseline
+            ratio[command] = np.where(baseline > 0, median / baseline, np.nan)
+    return {
+        'grid': grid,
+        'commands': commands,
+        'values': values,
+        'integrals': integrals,
+        'delta': delta,
+        'ratio': ratio,
+    }
@@ -0,0 +1,166 @@
+import glob
+import html
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import RenderCache
+from .segments import MANIFEST_SUFFIX
+
+INPUT_EXTENSIONS = ('.csv', '.pptrace', MANIFEST_SUFFIX)
+
+# Figures kept open in a worker between renders, keyed by figure size
+_figures = None
+
+def expand_inputs(patterns):
+    """Metrics files named by paths, glob patterns and directories, in order and without repeats"""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = sorted(os.path.join(pattern, name) for name in os.listdir(pattern) if is_metrics_file(name))
+        elif is_pattern(pattern):
+            paths = sorted(path for path in glob.glob(pattern, recursive=True) if is_metrics_file(path))
+        else:
+            paths = [pattern]
+        for path in paths:
+            if path not in found:
+                found.append(path)
+    return found
+
+def is_metrics_file(path):
+    """Whether a file found by a directory or glob input is one to render
+
+    compare writes a *_summary.csv of per-command statistics next to its
+    metrics, which has no time series to plot.
+    """
+    return path.endswith(INPUT_EXTENSIONS) and not path.endswith('_summary.csv')
+
+def is_pattern(path):
+    return any(c in path for c in '*?[')
+
+def output_path(input_file, output_dir=None):
+    """PNG path for input_file, next to it unless output_dir is given"""
+    base = input_file[:-len(MANIFEST_SUFFIX)] if input_file.endswith(MANIFEST_SUFFIX) else os.path.splitext(input_file)[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return f"{base}.png"
+
+def init_worker():
+    """Load matplotlib on the Agg backend once per worker process"""
+    global _figures
+    import matplotlib
+    matplotlib.use('Agg')
+    from . import plots  # noqa: F401
+    _figures = {}
+
+def render_task(task):
+    """Render one file; returns (input, output, kind, error, seconds)
+
+    With a cache, task carries its (directory, max_bytes) and the file's key,
+    and a successful render is stored under that key.
+    """
+    from .plots import render_metrics
+
+    input_file, output_file, downsample, max_points, delta, window, cache, key = task
+    start = time.perf_counter()
+    kind = error = None
+    try:
+        kind = render_metrics(input_file, output_file, downsample, max_points, _figures, delta, *window)
+        if kind is None:
+            error = "not enough data points"
+        elif cache is not None:
+            RenderCache(*cache).put(key, output_file)
+    except Exception as e:
+        # One unreadable file must not take the rest of the batch down
+        error = f"{type(e).__name__}: {e}"
+    return input_file, output_file, kind, error, time.perf_counter() - start
+
+def worker_count(jobs, files):
+    """Workers to use for files renders: jobs, or one per core, and never more than files"""
+    return max(1, min(jobs or os.cpu_count() or 1, files))
+
+def render_batch(inputs, output_dir=None, downsample='minmax', max_points=None, jobs=None, cache=None, delta=False, window=(None, None)):
+    """Render every input in a pool of worker processes, one per core by default
+
+    cache is an optional (directory, max_bytes) of a RenderCache shared by
+    the workers. Unchanged files are served from it before any worker
+    starts, with kind 'cached'. Returns the render_task results in input
+    order.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    store = RenderCache(*cache) if cache is not None else None
+    results = {}
+    tasks = []
+    for path in inputs:
+        output_file = output_path(path, output_dir)
+        start = time.perf_counter()
+        key = None
+        if store is not None and os.path.exists(path):
+            key = store.key(path, downsample=downsample, max_points=max_points, delta=delta, window=list(window))
+            if store.get(key, output_file):
+                results[path] = (path, output_file, 'cached', None, time.perf_counter() - start)
+                continue
+        tasks.append((path, output_file, downsample, max_points, delta, window, cache if key else None, key))
+
+    jobs = worker_count(jobs, len(tasks))
+    if not tasks:
+        rendered = []
+    elif jobs <= 1:
+        init_worker()
+        rendered = [render_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+            rendered = list(pool.map(render_task, tasks))
+    for result in rendered:
+        results[result[0]] = result
+    return [results[path] for path in inputs]
+
+def print_timings(results, wall_seconds, jobs):
+    """Print per-file render times, slowest first, and the batch total"""
+    rendered = sum(1 for result in results if result[3] is None)
+    print(f"Rendered {rendered} of {len(results)} files in {wall_seconds:.2f}s with {jobs} workers")
+    for input_file, output_file, kind, error, seconds in sorted(results, key=lambda result: -result[4]):
+        if error:
+            print(f"  {seconds:7.2f}s  {input_file}: FAILED ({error})")
+        else:
+            print(f"  {seconds:7.2f}s  {input_file} -> {output_file}{' (cached)' if kind == 'cached' else ''}")
+
+def write_index(results, index_file):
+    """Write an HTML page, or a PNG contact sheet, showing every rendered plot"""
+    rendered = [result for result in results if result[3] is None]
+    if index_file.endswith('.png'):
+        write_contact_sheet(rendered, index_file)
+        return
+    root = os.path.dirname(os.path.abspath(index_file))
+    with open(index_file, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Process plots</title>\n')
+        f.write('<style>body{font-family:sans-serif} figure{display:inline-block;margin:8px} img{width:480px}</style>\n')
+        f.write('</head><body>\n')
+        for input_file, output_file, kind, _, seconds in rendered:
+            src = html.escape(os.path.relpath(os.path.abspath(output_file), root))
+            f.write(f'<figure><a href="{src}"><img src="{src}" loading="lazy"></a>'
+                    f'<figcaption>{html.escape(input_file)} ({kind}, {seconds:.2f}s)</figcaption></figure>\n')
+        f.write('</body></html>\n')
+
+def write_contact_sheet(rendered, sheet_file, thumb_stride=8):
+    """Tile thumbnails of the rendered plots into one PNG"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    if not rendered:
+        return
+    cols = math.ceil(math.sqrt(len(rendered)))
+    rows = math.ceil(len(rendered) / cols)
+    fig, axes = plt.subplots(rows, cols, figsize=(cols * 4, rows * 3), squeeze=False)
+    for ax in axes.flat:
+        ax.axis('off')
+    for ax, (input_file, output_file, _, _, _) in zip(axes.flat, rendered):
+        # Plots are saved at 300 dpi; keep only every thumb_stride-th pixel
+        ax.imshow(plt.imread(output_file)[::thumb_stride, ::thumb_stride].copy())
+        ax.set_title(os.path.basename(input_file), fontsize=8)
+    fig.tight_layout()
+    fig.savefig(sheet_file, dpi=100)
+    plt.close(fig)
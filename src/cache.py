@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Bump when plot output changes, so renders cached by older code are not reused
+RENDER_VERSION = 1
+DEFAULT_CACHE_SIZE_MB = 500
+MAX_STAT_ENTRIES = 4096
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'process-plot', 'renders')
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+def _temp_path(directory):
+    """A new empty file in directory, to be filled and then os.replace'd into place"""
+    fd, path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    os.close(fd)
+    return path
+
+def _entries(directory, suffix):
+    """(mtime, size, path) of the finished files in directory, oldest first"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(suffix) and not entry.name.startswith('.tmp-'):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    return sorted(entries)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        # Another batch worker evicted it first
+        pass
+
+class RenderCache:
+    """Rendered PNGs stored under the hash of their input's content and the render options
+
+    Hashing the content of a large trace costs a full read, so the digest
+    is remembered per (path, size, mtime): an untouched file is keyed by a
+    stat call alone, and a touched but identical file still hits. Entries
+    are evicted least recently used first once the PNGs exceed max_bytes.
+    Writes go through a temporary file and os.replace, so parallel batch
+    workers can share one cache directory.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._stat_dir = os.path.join(self.directory, 'stat')
+        os.makedirs(self._stat_dir, exist_ok=True)
+
+    def _content_digest(self, input_file):
+        st = os.stat(input_file)
+        stat_path = os.path.join(self._stat_dir, _hash([os.path.realpath(input_file), st.st_size, st.st_mtime_ns]))
+        try:
+            with open(stat_path) as f:
+                return f.read().strip()
+        except OSError:
+            pass
+        digest = file_digest(input_file)
+        tmp = _temp_path(self._stat_dir)
+        with open(tmp, 'w') as f:
+            f.write(digest)
+        os.replace(tmp, stat_path)
+        return digest
+
+    def key(self, input_file, **options):
+        """Cache key of rendering input_file with options"""
+        return _hash({'content': self._content_digest(input_file), 'version': RENDER_VERSION, 'options': options})
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.png')
+
+    def get(self, key, output_file):
+        """Copy the cached render for key to output_file; False on a miss"""
+        path = self._path(key)
+        try:
+            if not (os.path.exists(output_file) and os.path.samefile(path, output_file)):
+                shutil.copyfile(path, output_file)
+            # The modification time records last use for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key, output_file):
+        """Store a fresh render of output_file under key and evict old entries"""
+        tmp = _temp_path(self.directory)
+        shutil.copyfile(output_file, tmp)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used renders beyond max_bytes, and the oldest stat entries"""
+        renders = _entries(self.directory, '.png')
+        total = sum(size for _, size, _ in renders)
+        for _, size, path in renders:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+        stats = _entries(self._stat_dir, '')
+        for _, _, path in stats[:max(0, len(stats) - MAX_STAT_ENTRIES)]:
+            _remove(path)
@@ -0,0 +1,159 @@
+import os
+import uuid
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+def current_cgroup():
+    """Path of this process's cgroup v2 relative to the hierarchy root, or None"""
+    try:
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+# Leaf the monitor moves itself into, so that the cgroup delegated to it has
+# no member processes and may enable controllers for its children
+MONITOR_LEAF = 'process-plot-monitor'
+CONTROLLERS = ('memory', 'io', 'pids')
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+def _write(path, value):
+    with open(path, 'w') as f:
+        f.write(value)
+
+def delegated_cgroup():
+    """Directory of the cgroup delegated to the monitor, or None without cgroup v2
+
+    That is the monitor's own cgroup, or its parent once the monitor has
+    moved into MONITOR_LEAF.
+    """
+    current = current_cgroup()
+    if current is None or not os.path.exists(os.path.join(CGROUP_ROOT, 'cgroup.controllers')):
+        return None
+    path = os.path.join(CGROUP_ROOT, current.lstrip('/'))
+    if os.path.basename(path) == MONITOR_LEAF:
+        path = os.path.dirname(path)
+    return path
+
+def enable_controllers(parent_dir):
+    """Enable CONTROLLERS for the children of parent_dir where it can
+
+    cgroup v2's no-internal-processes rule forbids that in a non-root
+    cgroup with member processes, so the monitor first moves itself into a
+    MONITOR_LEAF beside the command cgroups. Any other member processes
+    still make it fail, which leaves the command cgroup without memory
+    accounting and create() falls back.
+
+    Returns (moved, enabled): whether the monitor moved into the leaf and
+    the controllers it turned on, for restore_controllers to undo.
+    """
+    moved = False
+    try:
+        available = _read(os.path.join(parent_dir, 'cgroup.controllers')).split()
+        enabled = _read(os.path.join(parent_dir, 'cgroup.subtree_control')).split()
+        wanted = [c for c in CONTROLLERS if c in available and c not in enabled]
+        if not wanted:
+            return moved, []
+        if os.path.realpath(parent_dir) != os.path.realpath(CGROUP_ROOT) and \
+                str(os.getpid()) in _read(os.path.join(parent_dir, 'cgroup.procs')).split():
+            leaf = os.path.join(parent_dir, MONITOR_LEAF)
+            os.makedirs(leaf, exist_ok=True)
+            _write(os.path.join(leaf, 'cgroup.procs'), str(os.getpid()))
+            moved = True
+    except OSError:
+        return moved, []
+    turned_on = []
+    for controller in wanted:
+        try:
+            _write(os.path.join(parent_dir, 'cgroup.subtree_control'), f'+{controller}')
+            turned_on.append(controller)
+        except OSError:
+            pass
+    return moved, turned_on
+
+def restore_controllers(parent_dir, moved, enabled):
+    """Undo enable_controllers once the command cgroups are gone
+
+    Turns the controllers back off, moves the monitor back into
+    parent_dir and removes MONITOR_LEAF. While other cgroups remain beside
+    the leaf, or processes other than this monitor in it (other monitors
+    and their commands), everything is left as it is for them.
+    """
+    leaf = os.path.join(parent_dir, MONITOR_LEAF)
+    try:
+        others = [name for name in os.listdir(parent_dir) if name != MONITOR_LEAF and os.path.isdir(os.path.join(parent_dir, name))]
+        if others or (moved and _read(os.path.join(leaf, 'cgroup.procs')).split() != [str(os.getpid())]):
+            return
+        for controller in enabled:
+            _write(os.path.join(parent_dir, 'cgroup.subtree_control'), f'-{controller}')
+        if moved:
+            _write(os.path.join(parent_dir, 'cgroup.procs'), str(os.getpid()))
+            os.rmdir(leaf)
+    except OSError:
+        pass
+
+class TransientCgroup:
+    """A cgroup v2 leaf created for one command in the cgroup delegated to the monitor
+
+    The command is moved into it before exec, so everything it spawns,
+    including daemonized grandchildren, is accounted by the kernel without
+    walking the process tree.
+    """
+
+    REQUIRED_FILES = ('cgroup.procs', 'memory.current', 'cpu.stat')
+
+    def __init__(self, path, moved=False, enabled=()):
+        self.path = path
+        self.moved = moved
+        self.enabled = list(enabled)
+
+    @classmethod
+    def create(cls):
+        """Create a transient cgroup, or return None if cgroup v2 is not mounted, writable and delegated"""
+        parent_dir = delegated_cgroup()
+        if parent_dir is None:
+            return None
+        moved, enabled = enable_controllers(parent_dir)
+        path = os.path.join(parent_dir, f'process-plot-{os.getpid()}-{uuid.uuid4().hex[:8]}')
+        try:
+            os.mkdir(path)
+        except OSError:
+            restore_controllers(parent_dir, moved, enabled)
+            return None
+
+        cgroup = cls(path, moved, enabled)
+        if not all(os.path.exists(os.path.join(path, name)) for name in cls.REQUIRED_FILES) \
+                or not os.access(os.path.join(path, 'cgroup.procs'), os.W_OK):
+            cgroup.remove()
+            return None
+        return cgroup
+
+    def wrap(self, command):
+        """command prefixed with a shell that moves itself into the cgroup and execs it
+
+        Done in the child's own code rather than a Popen preexec_fn, which
+        is unsafe to run between fork and exec while other threads (the live
+        server) run. If the move fails the command does not run and exits 126.
+        """
+        return ['/bin/sh', '-c', 'echo $$ > "$0" || exit 126; exec "$@"', os.path.join(self.path, 'cgroup.procs')] + list(command)
+
+    def remove(self):
+        """Remove the cgroup, returning False while processes still live in it
+
+        Once it is gone, what create() changed in the delegated cgroup is
+        undone (see restore_controllers).
+        """
+        try:
+            os.rmdir(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        restore_controllers(os.path.dirname(self.path), self.moved, self.enabled)
+        return True
@@ -0,0 +1,186 @@
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+from datetime import datetime
+
+from .summary import SUMMARY_METRICS
+
+# Metrics gated by check, with the default tolerance in percent over the
+# baseline median and an absolute floor in the metric's unit, so that tiny
+# values (a 20 ms command's CPU time) do not fail on scheduling noise. Peak
+# memory includes wait4's ru_maxrss, since the sampled peak and VmHWM both
+# depend on where the samples land (see RunStats.peak_memory_mb).
+CHECK_METRICS = [
+    ('peak_memory_mb', 10.0, 1.0),
+    ('cpu_seconds', 20.0, 0.05),
+    ('wall_seconds', 20.0, 0.05),
+    ('mem_time_mb_s', 15.0, 1.0),
+]
+TITLES = dict(SUMMARY_METRICS, peak_memory_mb='Peak memory (MB)')
+PERMUTATION_ROUNDS = 10000
+
+# A baseline is {"baseline_version": 1, "created": ..., "host": ...,
+# "tolerances": {metric: percent}, "commands": {label: {"command": "...",
+# "trials": {metric: [value per trial]}}}}. Raw trial values are kept, not
+# just medians, so a later check can test whether its trials differ.
+
+def new_baseline():
+    return {
+        'baseline_version': 1,
+        'created': None,
+        'host': None,
+        'tolerances': {metric: tolerance for metric, tolerance, _ in CHECK_METRICS},
+        'commands': {},
+    }
+
+def read_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+def write_baseline(path, baseline):
+    """Replace the baseline file atomically"""
+    baseline['created'] = datetime.now().isoformat(timespec='seconds')
+    baseline['host'] = platform.node()
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(baseline, f, indent=1)
+    os.replace(tmp, path)
+
+def record_trials(baseline, label, command, runs):
+    """Store the check metrics of runs (RunStats) as label's baseline"""
+    baseline['commands'][label] = {
+        'command': command,
+        'trials': {metric: [getattr(run, metric) for run in runs] for metric, _, _ in CHECK_METRICS},
+    }
+
+def parse_tolerance(value):
+    """Parse METRIC=PERCENT, e.g. peak_memory_mb=5%"""
+    metrics = [metric for metric, _, _ in CHECK_METRICS]
+    metric, sep, percent = value.partition('=')
+    if not sep or metric not in metrics:
+        raise ValueError(f"expected METRIC=PERCENT with METRIC one of {', '.join(metrics)}")
+    return metric, float(percent.rstrip('%'))
+
+def permutation_p_value(baseline, current, rounds=PERMUTATION_ROUNDS):
+    """One-sided p-value that current's mean exceeds baseline's by chance
+
+    Exact over every relabelling of the pooled trials when there are at
+    most rounds of them, otherwise estimated from rounds seeded random
+    relabellings, so the same inputs always give the same answer.
+    """
+    pooled = list(baseline) + list(current)
+    n = len(current)
+    observed = statistics.fmean(current) - statistics.fmean(baseline)
+    total = sum(pooled)
+
+    def extreme(indices):
+        chosen = sum(pooled[i] for i in indices)
+        # The difference in means of a relabelling, with a little slack for float error
+        return chosen / n - (total - chosen) / (len(pooled) - n) >= observed - 1e-12 * (abs(observed) + 1)
+
+    if math.comb(len(pooled), n) <= rounds:
+        combos = list(itertools.combinations(range(len(pooled)), n))
+        return sum(extreme(c) for c in combos) / len(combos)
+    rng = random.Random(0)
+    hits = sum(extreme(rng.sample(range(len(pooled)), n)) for _ in range(rounds))
+    return (hits + 1) / (rounds + 1)
+
+def smallest_p_value(n_baseline, n_current):
+    """The smallest p-value a permutation test on this many trials can reach"""
+    return 1 / math.comb(n_baseline + n_current, n_current)
+
+def compare_metric(metric, baseline, current, tolerance, floor, alpha):
+    """Verdict for one metric: a dict with medians, change, p-value and status
+
+    A metric regresses when the current median exceeds the baseline
+    median by more than tolerance percent and by more than floor, and,
+    when there are enough trials for the test to mean anything, the
+    permutation test rejects chance at alpha.
+    """
+    old = statistics.median(baseline)
+    new = statistics.median(current)
+    change = (new - old) / old * 100 if old else (0.0 if new == old else math.inf)
+    p_value = None
+    if smallest_p_value(len(baseline), len(current)) <= alpha:
+        p_value = permutation_p_value(baseline, current)
+    over = new - old > floor and change > tolerance
+    if over and (p_value is None or p_value <= alpha):
+        status = 'REGRESSED'
+    elif over:
+        status = 'noisy'
+    elif old - new > floor and -change > tolerance:
+        status = 'improved'
+    else:
+        status = 'ok'
+    return {
+        'metric': metric,
+        'baseline': old,
+        'current': new,
+        'change': change,
+        'tolerance': tolerance,
+        'p_value': p_value,
+        'status': status,
+    }
+
+def check_against_baseline(baseline, trials, tolerances=None, alpha=0.05):
+    """Compare {label: [RunStats, ...]} with a baseline; returns (results, notes)
+
+    results holds one row per command and metric, each the dict of
+    compare_metric plus the command label. notes lists commands missing
+    on either side, which are reported but do not fail the check.
+    """
+    limits = dict(baseline.get('tolerances', {}))
+    limits.update(tolerances or {})
+    results = []
+    notes = []
+    for label, runs in trials.items():
+        entry = baseline['commands'].get(label)
+        if entry is None:
+            notes.append(f"{label}: not in the baseline (run with --update to add it)")
+            continue
+        for metric, default, floor in CHECK_METRICS:
+            old = entry['trials'].get(metric)
+            if not old:
+                notes.append(f"{label}: the baseline has no {metric}")
+                continue
+            result = compare_metric(metric, old, [getattr(run, metric) for run in runs], limits.get(metric, default), floor, alpha)
+            result['command'] = label
+            results.append(result)
+    for label in baseline['commands']:
+        if label not in trials:
+            notes.append(f"{label}: in the baseline but not run")
+    return results, notes
+
+def regressed(results):
+    return [result for result in results if result['status'] == 'REGRESSED']
+
+def _format_change(change):
+    return 'new' if math.isinf(change) else f"{change:+.1f}%"
+
+def print_check(results, notes, alpha):
+    """Print results as a table, regressions first, and the notes after it"""
+    headers = ['Command', 'Metric', 'Baseline', 'Current', 'Change', 'Tolerance', 'p', 'Status']
+    order = {'REGRESSED': 0, 'noisy': 1, 'improved': 2, 'ok': 3}
+    table = [[
+        result['command'],
+        TITLES[result['metric']],
+        f"{result['baseline']:.2f}",
+        f"{result['current']:.2f}",
+        _format_change(result['change']),
+        f"{result['tolerance']:g}%",
+        '-' if result['p_value'] is None else f"{result['p_value']:.3f}",
+        result['status'],
+    ] for result in sorted(results, key=lambda r: order[r['status']])]
+    widths = [max(len(cell) for cell in column) for column in zip(headers, *table)]
+    for line in [headers] + table:
+        print('  '.join(cell.ljust(width) for cell, width in zip(line, widths)))
+    for note in notes:
+        print(f"Note: {note}")
+    if any(result['p_value'] is None for result in results):
+        print(f"p is '-' where there are too few trials for a test at alpha={alpha}; the tolerance alone decides")
+    if any(result['status'] == 'noisy' for result in results):
+        print(f"'noisy' medians exceed their tolerance, but the trials do not differ significantly at alpha={alpha}")
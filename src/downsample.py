@@ -0,0 +1,68 @@
+import numpy as np
+
+def auto_max_points(fig_width, dpi):
+    """Point budget for a figure: two points per horizontal pixel"""
+    return int(fig_width * dpi) * 2
+
+def minmax_indices(y, max_points):
+    """Indices of the minimum and maximum of y in each of max_points // 2 buckets
+
+    Every extreme survives, so short memory spikes stay visible however
+    many samples share a pixel column.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    size = -(-n // buckets)
+    full = n // size
+    body = np.asarray(y[:full * size]).reshape(full, size)
+    offsets = np.arange(full) * size
+    indices = [offsets + body.argmin(axis=1), offsets + body.argmax(axis=1)]
+    if full * size < n:
+        tail = np.asarray(y[full * size:])
+        indices.append(np.array([full * size + tail.argmin(), full * size + tail.argmax()]))
+    return np.unique(np.concatenate(indices))
+
+def lttb_indices(x, y, max_points):
+    """Indices chosen by Largest-Triangle-Three-Buckets
+
+    The first and last points are kept and the rest are split into
+    max_points - 2 buckets. Bucket bounds and the averages of each next
+    bucket are computed in one vectorized pass; picking the point that
+    forms the largest triangle with the previous pick and the next
+    bucket's average is a NumPy argmax per bucket.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    buckets = max_points - 2
+    bounds = (np.arange(buckets + 1) * (n - 2) // buckets + 1).astype(np.intp)
+    starts, ends = bounds[:-1], bounds[1:]
+    counts = ends - starts
+    x_avg = np.add.reduceat(x[1:n - 1], starts - 1) / counts
+    y_avg = np.add.reduceat(y[1:n - 1], starts - 1) / counts
+    # The last bucket looks ahead to the final point instead of a bucket average
+    next_x = np.append(x_avg[1:], x[-1])
+    next_y = np.append(y_avg[1:], y[-1])
+
+    selected = np.empty(buckets + 2, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(buckets):
+        s, e = starts[i], ends[i]
+        area = np.abs((x[a] - next_x[i]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (next_y[i] - y[a]))
+        a = s + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def downsample_indices(x, y, mode, max_points):
+    """Indices of the points to plot for mode ('minmax', 'lttb' or 'none')"""
+    if mode == 'none' or not max_points:
+        return np.arange(len(y))
+    if mode == 'lttb':
+        return lttb_indices(x, y, max_points)
+    return minmax_indices(y, max_points)
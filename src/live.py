@@ -0,0 +1,264 @@
+import collections
+import ipaddress
+import itertools
+import json
+import math
+import os
+import socket
+import socketserver
+import stat
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class RingBuffer:
+    """The most recent rows written by the sampler, numbered by sequence
+
+    The sampling thread only appends; readers ask for the rows after the
+    last sequence number they saw and may block until new ones arrive.
+    Rows that fell out of the buffer are simply skipped.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.next_seq = 0
+        self.closed = False
+        self._rows = collections.deque(maxlen=capacity)
+        self._changed = threading.Condition()
+
+    def append(self, row):
+        with self._changed:
+            self._rows.append(row)
+            self.next_seq += 1
+            self._changed.notify_all()
+
+    def close(self):
+        """Wake every waiting reader for the last time"""
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def since(self, seq=-1, timeout=None):
+        """Rows numbered after seq and the sequence number of the last one
+
+        With a timeout, waits up to that long for rows if there are none yet.
+        """
+        with self._changed:
+            if timeout is not None and self.next_seq <= seq + 1 and not self.closed:
+                self._changed.wait(timeout)
+            first = self.next_seq - len(self._rows)
+            start = max(0, seq + 1 - first)
+            return list(itertools.islice(self._rows, start, None)), self.next_seq - 1
+
+def _json_value(value):
+    """A row value as JSON allows it: dates as ISO strings, NaN and infinities as null"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, float) and not math.isfinite(value):
+        # Unreadable tier metrics are NaN, which JSON.parse rejects
+        return None
+    return value
+
+def _clean(row):
+    return [_json_value(v) for v in row]
+
+def _encode(columns, row):
+    return json.dumps(dict(zip(columns, _clean(row))), allow_nan=False)
+
+LIVE_PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>process-plot live</title>
+<style>body{font-family:sans-serif;margin:16px} canvas{border:1px solid #ccc}</style>
+</head><body>
+<h3>Memory usage (live)</h3>
+<canvas id="plot" width="1000" height="400"></canvas>
+<div id="status"></div>
+<script>
+const colors = ['blue', 'red', 'green', 'orange', 'purple'];
+const series = new Map();
+const canvas = document.getElementById('plot');
+const ctx = canvas.getContext('2d');
+let dirty = false;
+
+function key(row) {
+  if ('command' in row) return row.command + ' #' + row.trial;
+  if ('pid' in row) return 'PID ' + row.pid;
+  return 'memory';
+}
+function x(row) {
+  return 'seconds_elapsed' in row ? row.seconds_elapsed : Date.parse(row.timestamp) / 1000;
+}
+function draw() {
+  dirty = false;
+  let x0 = Infinity, x1 = -Infinity, y1 = 0;
+  for (const points of series.values()) for (const [px, py] of points) {
+    x0 = Math.min(x0, px); x1 = Math.max(x1, px); y1 = Math.max(y1, py);
+  }
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  if (!isFinite(x0)) return;
+  const sx = v => 40 + (v - x0) / Math.max(x1 - x0, 1e-9) * (canvas.width - 50);
+  const sy = v => canvas.height - 20 - v / Math.max(y1, 1e-9) * (canvas.height - 40);
+  let i = 0;
+  for (const [name, points] of series) {
+    ctx.strokeStyle = ctx.fillStyle = colors[i % colors.length];
+    ctx.beginPath();
+    points.forEach(([px, py], j) => j ? ctx.lineTo(sx(px), sy(py)) : ctx.moveTo(sx(px), sy(py)));
+    ctx.stroke();
+    ctx.fillText(name, 50, 15 + 12 * i++);
+  }
+  ctx.fillStyle = 'black';
+  ctx.fillText(y1.toFixed(1) + ' MB', 0, 15);
+}
+const events = new EventSource('events');
+events.onmessage = e => {
+  const row = JSON.parse(e.data);
+  const name = key(row);
+  if (!series.has(name)) series.set(name, []);
+  const points = series.get(name);
+  points.push([x(row), row.memory_mb]);
+  if (points.length > 5000) points.shift();
+  document.getElementById('status').textContent = 'CPU ' + row.cpu_percent.toFixed(1) + '%, memory ' + row.memory_mb.toFixed(1) + ' MB';
+  if (!dirty) { dirty = true; requestAnimationFrame(draw); }
+};
+events.onerror = () => { document.getElementById('status').textContent = 'Monitoring ended'; events.close(); };
+</script>
+</body></html>
+"""
+
+class LiveHandler(BaseHTTPRequestHandler):
+    """Serve the ring buffer: / live page, /snapshot JSON, /stream NDJSON, /events SSE"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            since = int(query.get('since', ['-1'])[0])
+        except ValueError:
+            self._send(400, 'text/plain', b'since must be an integer\n')
+            return
+        if url.path == '/':
+            self._send(200, 'text/html; charset=utf-8', LIVE_PAGE)
+        elif url.path == '/snapshot':
+            rows, last = self.server.buffer.since(since)
+            body = json.dumps({'columns': self.server.columns, 'rows': [_clean(row) for row in rows], 'last': last}, allow_nan=False)
+            self._send(200, 'application/json', body.encode())
+        elif url.path == '/stream':
+            self._stream(since, 'application/x-ndjson', '{}\n')
+        elif url.path == '/events':
+            self._stream(since, 'text/event-stream', 'data: {}\n\n')
+        else:
+            self._send(404, 'text/plain', b'not found\n')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, since, content_type, template):
+        """Send rows as they arrive, until the monitor stops or the client leaves"""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        buffer = self.server.buffer
+        columns = self.server.columns
+        try:
+            while True:
+                rows, since = buffer.since(since, timeout=1.0)
+                if rows:
+                    self.wfile.write(''.join(template.format(_encode(columns, row)) for row in rows).encode())
+                    self.wfile.flush()
+                elif buffer.closed:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class LiveServer(ThreadingHTTPServer):
+    """HTTP server for a RingBuffer on localhost or a Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self, address, buffer, columns):
+        self.buffer = buffer
+        self.columns = list(columns)
+        self.unix_path = address if isinstance(address, str) else None
+        if self.unix_path:
+            self.address_family = socket.AF_UNIX
+            if is_socket(address):
+                os.remove(address)
+            elif os.path.lexists(address):
+                raise FileExistsError(f"{address} exists and is not a socket")
+        super().__init__(address, LiveHandler)
+
+    def server_bind(self):
+        if self.unix_path:
+            socketserver.TCPServer.server_bind(self)
+            self.server_name = 'localhost'
+            self.server_port = 0
+        else:
+            super().server_bind()
+
+    def get_request(self):
+        request, client_address = super().get_request()
+        # Unix socket peers have no address; the handler expects a (host, port)
+        return request, client_address or ('local', 0)
+
+    def url(self):
+        if self.unix_path:
+            return f"unix:{self.unix_path}"
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+def is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+def parse_address(value):
+    """A Unix socket path (anything with a '/') or a localhost (host, port) from PORT or HOST:PORT
+
+    Raises ValueError for a path that exists but is not a socket, which
+    would otherwise be replaced, and for hosts other than loopback ones:
+    the endpoint has no authentication.
+    """
+    if '/' in value:
+        if os.path.lexists(value) and not is_socket(value):
+            raise ValueError(f"{value} exists and is not a socket")
+        return value
+    host, _, port = value.rpartition(':')
+    if host and not is_loopback(host):
+        raise ValueError(f"{host} is not a loopback address; the live endpoint only serves localhost")
+    return (host or '127.0.0.1', int(port))
+
+def start_live_server(address, columns, capacity=10000):
+    """Serve a new ring buffer from a background thread; returns (buffer, server)"""
+    buffer = RingBuffer(capacity)
+    server = LiveServer(parse_address(address), buffer, columns)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving live samples at {server.url()}")
+    return buffer, server
+
+def stop_live_server(buffer, server):
+    """End every open stream and shut the server down"""
+    buffer.close()
+    server.shutdown()
+    server.server_close()
+    if server.unix_path and is_socket(server.unix_path):
+        os.remove(server.unix_path)
@@ -0,0 +1,211 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+from .align import align_comparison, split_runs
+from .downsample import auto_max_points, downsample_indices
+from .segments import is_manifest, load_segments, window_parser
+from .trace import is_trace, trace_to_dataframe
+
+def load_metrics(path, nrows=None, start=None, end=None):
+    """Load metrics from a CSV file, a binary trace or a segment manifest as a DataFrame
+
+    start and end optionally keep only rows inside a window of the first
+    column, given as dates for timestamps or seconds for seconds_elapsed.
+    """
+    if is_manifest(path):
+        df = load_segments(path, start, end)
+    elif is_trace(path):
+        df = trace_to_dataframe(path)
+    elif start is None and end is None:
+        return pd.read_csv(path, nrows=nrows)
+    else:
+        df = pd.read_csv(path)
+    if (start is not None or end is not None) and len(df.columns):
+        df = select_window(df, start, end)
+    return df if nrows is None else df.head(nrows)
+
+def select_window(df, start=None, end=None):
+    """Rows whose first column lies within [start, end]"""
+    parse = window_parser(df.columns)
+    key = df.columns[0]
+    values = pd.to_datetime(df[key]) if key == 'timestamp' else df[key]
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= values >= parse(start)
+    if end is not None:
+        mask &= values <= parse(end)
+    return df[mask].reset_index(drop=True)
+
+def _axes(figsize, figures, rows=1, height_ratios=None):
+    """A fresh figure and axes, reusing a cleared figure from figures when given
+
+    With rows > 1 the axes are stacked vertically on a shared time axis and
+    returned as an array.
+    """
+    if figures is None:
+        fig = plt.figure(figsize=figsize)
+    else:
+        fig = figures.get(figsize)
+        if fig is None:
+            fig = figures[figsize] = plt.figure(figsize=figsize)
+        fig.clf()
+    if rows == 1:
+        return fig, fig.add_subplot()
+    return fig, fig.subplots(rows, 1, sharex=True, gridspec_kw={'height_ratios': height_ratios})
+
+def _finish(fig, output_file, figures):
+    fig.tight_layout()
+    fig.savefig(output_file, dpi=300, bbox_inches='tight')
+    if figures is None:
+        plt.close(fig)
+
+def render_single_plot(csv_file, output_file, downsample='minmax', max_points=None, figures=None):
+    """Render plot for single process monitoring"""
+    return plot_single(load_metrics(csv_file), output_file, downsample, max_points, figures)
+
+def plot_single(df, output_file, downsample='minmax', max_points=None, figures=None):
+    """Render a single-process plot from a loaded DataFrame
+
+    figures is an optional dict of figures kept open between calls, so a
+    batch of renders reuses one canvas per figure size.
+    """
+    if len(df) < 2:
+        print("Not enough data points to create plot.")
+        return False
+    
+    fig, ax = _axes((12, 8), figures)
+    max_points = max_points or auto_max_points(fig.get_figwidth(), 300)
+    
+    # Convert MB to GB for better readability if values are large
+    overall_max = df['memory_mb'].max()
+    scale_factor = 1024 if overall_max > 1000 else 1
+    mem_label = 'Memory (GB)' if overall_max > 1000 else 'Memory (MB)'
+    
+    # Multi-process monitoring draws one line per monitored PID
+    targets = df.groupby('pid', sort=True) if 'pid' in df.columns else [(None, df)]
+    colors = ['blue', 'red', 'green', 'orange', 'purple']
+    for i, (pid, target_data) in enumerate(targets):
+        times = pd.to_datetime(target_data['timestamp'])
+        mem = target_data['memory_mb']
+        
+        # Only plot as many points as the output has pixels to show
+        keep = downsample_indices(times.to_numpy().view('i8'), mem.to_numpy(), downsample, max_points)
+        times = times.iloc[keep]
+        mem = mem.iloc[keep]
+        
+        if pid is None:
+            ax.plot(times, mem / scale_factor, 'b-', label=mem_label, linewidth=2)
+        else:
+            ax.plot(times, mem / scale_factor, color=colors[i % len(colors)], label=f'PID {pid}', linewidth=2)
+    if 'pid' in df.columns:
+        ax.legend()
+    
+    ax.set_xlabel('Timestamp')
+    ax.set_ylabel(mem_label, color='b')
+    ax.tick_params(axis='y', labelcolor='b')
+    
+    # Format x-axis dates
+    fig.autofmt_xdate()
+    
+    ax.set_title('Process Memory Usage')
+    _finish(fig, output_file, figures)
+    return True
+
+def render_comparison_plot(csv_file, output_file, downsample='minmax', max_points=None, figures=None, delta=False):
+    """Render comparison plot for multiple processes"""
+    return plot_comparison(load_metrics(csv_file), output_file, downsample, max_points, figures, delta)
+
+def plot_comparison(df, output_file, downsample='minmax', max_points=None, figures=None, delta=False):
+    """Render a comparison plot from a loaded DataFrame
+
+    With delta, every run is also resampled onto a common time grid and two
+    panels are added below: each command's median memory minus the first
+    command's (with their ratio on a second axis), and the cumulative
+    memory-time of each command. The main panel then also shades the
+    min-max envelope across each command's trials.
+    """
+    if len(df) < 2:
+        print("Not enough data points to create plot.")
+        return False
+    
+    # One groupby pass splits the frame into per-trial arrays
+    runs = split_runs(df)
+    
+    if delta:
+        fig, (ax, delta_ax, integral_ax) = _axes((14, 14), figures, rows=3, height_ratios=[2, 1, 1])
+    else:
+        fig, ax = _axes((14, 8), figures)
+    
+    colors = ['blue', 'red', 'green', 'orange', 'purple']
+    max_points = max_points or auto_max_points(fig.get_figwidth(), 300)
+    
+    # Determine if we should use GB based on overall max
+    overall_max = df['memory_mb'].max()
+    if overall_max > 1000:
+        mem_unit = 'GB'
+        scale_factor = 1024
+    else:
+        mem_unit = 'MB'
+        scale_factor = 1
+    
+    command_colors = {}
+    for i, (command, trials) in enumerate(runs.items()):
+        color = command_colors[command] = colors[i % len(colors)]
+        
+        # Repeated trials share their command's color and legend entry
+        for j, (times, mem) in enumerate(trials):
+            # Only plot as many points as the output has pixels to show
+            keep = downsample_indices(times, mem, downsample, max_points)
+            
+            # Apply consistent scaling across all commands
+            ax.plot(times[keep], mem[keep] / scale_factor, color=color, label=command if j == 0 else None, linewidth=2)
+    
+    if delta:
+        aligned = align_comparison(runs)
+        grid = aligned['grid']
+        for command in aligned['commands']:
+            low, _, high = aligned['values'][command]
+            ax.fill_between(grid, low / scale_factor, high / scale_factor, color=command_colors[command], alpha=0.15, linewidth=0)
+        
+        baseline = aligned['commands'][0]
+        ratio_ax = delta_ax.twinx()
+        for command in aligned['commands'][1:]:
+            color = command_colors[command]
+            delta_ax.plot(grid, aligned['delta'][command] / scale_factor, color=color, linewidth=2, label=f'{command} - {baseline}')
+            ratio_ax.plot(grid, aligned['ratio'][command], color=color, linewidth=1, linestyle='--', label=f'{command} / {baseline}')
+        delta_ax.axhline(0, color='gray', linewidth=1)
+        delta_ax.set_ylabel(f'Median delta ({mem_unit})')
+        ratio_ax.set_ylabel('Median ratio (dashed)')
+        delta_ax.grid(True, alpha=0.3)
+        delta_ax.set_title(f'Difference from {baseline} on a common time grid')
+        
+        for command in aligned['commands']:
+            low, median, high = aligned['integrals'][command]
+            integral_ax.plot(grid, median / scale_factor, color=command_colors[command], linewidth=2, label=command)
+            integral_ax.fill_between(grid, low / scale_factor, high / scale_factor, color=command_colors[command], alpha=0.15, linewidth=0)
+        integral_ax.set_ylabel(f'Memory-time ({mem_unit}*s)')
+        integral_ax.set_xlabel('Time (seconds since process start)')
+        integral_ax.legend()
+        integral_ax.grid(True, alpha=0.3)
+        integral_ax.set_title('Cumulative memory-time (median, min-max across trials)')
+    else:
+        ax.set_xlabel('Time (seconds since process start)')
+    
+    ax.set_ylabel(f'Memory ({mem_unit})')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    
+    ax.set_title('Memory Usage Comparison')
+    _finish(fig, output_file, figures)
+    return True
+
+def render_metrics(input_file, output_file, downsample='minmax', max_points=None, figures=None, delta=False, start=None, end=None):
+    """Render the plot that fits input_file's layout
+
+    delta only applies to comparisons; start and end select a time window
+    as in load_metrics. Returns 'comparison' or 'single', or None if there
+    was too little data.
+    """
+    df = load_metrics(input_file, start=start, end=end)
+    if 'command' in df.columns:
+        return 'comparison' if plot_comparison(df, output_file, downsample, max_points, figures, delta) else None
+    return 'single' if plot_single(df, output_file, downsample, max_points, figures) else None
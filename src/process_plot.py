@@ -4,148 +4,389 @@ import subprocess
 import time
 import argparse
 import threading
+import random
+import shlex
 import csv
 import os
+import re
+import sys
 from datetime import datetime
 import uuid
-import matplotlib.pyplot as plt
-import pandas as pd
+from .sampler import SAMPLERS, METRIC_TIERS, make_sampler, tier_metrics
+from .cgroup import TransientCgroup
+from .scheduler import DeadlineScheduler, OverheadBudget, AdaptiveInterval
+from .writer import RowWriter
+from .summary import RunStats, summarize, print_summary, write_summary
+from .trace import TraceWriter, is_trace, write_trace_header
+from .segments import COMPRESSIONS, SegmentWriter, is_manifest, manifest_path, write_manifest_header, zstandard_available
+from .cache import DEFAULT_CACHE_SIZE_MB
 
-def write_metrics_to_csv(process, interval, output_file, command_label=None, command_start_time=None, start_time=None):
+# Plotting pulls in pandas and matplotlib, which cost hundreds of
+# milliseconds and tens of MB. The sampling paths only need psutil and the
+# standard library, so everything from .plots and .watch is imported where
+# a render actually runs.
+
+OUTPUT_FORMATS = ('csv', 'binary')
+DOWNSAMPLE_MODES = ('minmax', 'lttb', 'none')
+MONITOR_COLUMNS = ['timestamp', 'cpu_percent', 'memory_mb', 'sample_ms', 'monitor_cpu_percent', 'interval_s', 'peak_hwm_mb', 'cpu_seconds']
+MULTI_MONITOR_COLUMNS = ['timestamp', 'cpu_percent', 'memory_mb', 'sample_ms', 'pid', 'monitor_cpu_percent', 'interval_s', 'peak_hwm_mb', 'cpu_seconds']
+COMPARE_COLUMNS = ['seconds_elapsed', 'cpu_percent', 'memory_mb', 'command', 'sample_ms', 'trial', 'monitor_cpu_percent', 'interval_s', 'peak_hwm_mb', 'cpu_seconds']
+# Long-format output, one row per process per tick; always CSV since it holds process names
+PROCESS_COLUMNS = ['timestamp', 'root_pid', 'pid', 'name', 'cpu_percent', 'memory_mb']
+COMPARE_PROCESS_COLUMNS = ['seconds_elapsed', 'command', 'trial', 'pid', 'name', 'cpu_percent', 'memory_mb']
+
+def write_header(output_file, columns, output_format='csv', labels=(), segmenting=None):
+    """Create an output file holding only the column header
+
+    With segmenting (compression and rotation settings) the output is a
+    manifest of CSV segments instead.
+    """
+    if segmenting:
+        write_manifest_header(output_file, columns, labels, **segmenting)
+        return
+    if output_format == 'binary':
+        write_trace_header(output_file, columns, labels)
+        return
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+
+def open_row_writer(output_file, flush_every, flush_ms):
+    """Open a background writer matching the format of output_file"""
+    if is_manifest(output_file):
+        writer_class = SegmentWriter
+    else:
+        writer_class = TraceWriter if is_trace(output_file) else RowWriter
+    return writer_class(output_file, flush_every, flush_ms)
+
+def metric_values(metrics, names):
+    """Values of the named metrics, NaN where one could not be read"""
+    return [float('nan') if metrics.get(name) is None else metrics[name] for name in names]
+
+def write_process_rows(writer, prefix, tree_sampler):
+    """Write one long-format row per process the sampler saw this tick"""
+    for pid, name, cpu, rss, metrics in tree_sampler.processes:
+        writer.writerow(prefix + [pid, name, cpu, rss / (1024 * 1024)] + metric_values(metrics, tree_sampler.metrics))
+
+def output_extension(output_format):
+    return 'pptrace' if output_format == 'binary' else 'csv'
+
+def __getattr__(name):
+    # Keep the render helpers importable from here without loading them eagerly
+    if name in ('load_metrics', 'render_single_plot', 'render_comparison_plot'):
+        from . import plots
+        return getattr(plots, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def write_metrics_to_csv(process, interval, output_file, command_label=None, command_start_time=None, start_time=None, sampler='auto', flush_every=100, flush_ms=1000, max_overhead=None, adaptive=False, min_interval=None, max_interval=None, metrics='basic', expensive_every=10, per_process=None, live=None, cgroup=None, trial=None, stats=None):
     """Write process metrics to CSV file"""
     time_reference = command_start_time if command_start_time else start_time
-    
-    with open(output_file, 'a', newline='') as f:
-        writer = csv.writer(f)
+    tree_sampler = make_sampler(sampler, process, cgroup, tier=metrics, per_process=bool(per_process), expensive_every=expensive_every)
+    scheduler = DeadlineScheduler(interval)
+    overhead = OverheadBudget(scheduler, max_overhead)
+    adaptive_interval = make_adaptive_interval(interval, adaptive, min_interval, max_interval)
+    writer = open_row_writer(output_file, flush_every, flush_ms)
+    process_writer = RowWriter(per_process, flush_every, flush_ms) if per_process else None
+    
+    try:
         while process.is_running():
             try:
                 # Get CPU and memory for the main process and all children
-                total_cpu = process.cpu_percent(interval=None)
-                total_mem = process.memory_info().rss
-                
-                # Add memory from all child processes recursively
-                try:
-                    children = process.children(recursive=True)
-                    for child in children:
-                        try:
-                            total_cpu += child.cpu_percent(interval=None)
-                            total_mem += child.memory_info().rss
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            continue
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
+                sample_start = time.perf_counter()
+                total_cpu, total_mem = tree_sampler.sample()
+                sample_ms = (time.perf_counter() - sample_start) * 1000
                 
                 mem_mb = total_mem / (1024 * 1024)  # Convert to MB
                 elapsed_seconds = (datetime.now() - time_reference).total_seconds()
+                if stats is not None:
+                    stats.add(elapsed_seconds, total_cpu, mem_mb)
+                
+                
+                # Record the interval this sample was taken at, then pick the next one
+                interval_s = scheduler.interval
+                if adaptive_interval is not None:
+                    overhead.base_interval = adaptive_interval.update(total_cpu, mem_mb)
+                monitor_cpu = overhead.update()
+                
+                peak_hwm_mb = tree_sampler.peak_hwm / (1024 * 1024)
+                extra = metric_values(tree_sampler.extra, tree_sampler.metrics)
                 
                 if command_label:
-                    writer.writerow([elapsed_seconds, total_cpu, mem_mb, command_label])
+                    row = [elapsed_seconds, total_cpu, mem_mb, command_label, sample_ms, trial or 0, monitor_cpu, interval_s, peak_hwm_mb, tree_sampler.cpu_seconds] + extra
+                    prefix = [elapsed_seconds, command_label, trial or 0]
                 else:
-                    writer.writerow([datetime.now().isoformat(), total_cpu, mem_mb])
-                f.flush()
+                    timestamp = datetime.now()
+                    row = [timestamp, total_cpu, mem_mb, sample_ms, monitor_cpu, interval_s, peak_hwm_mb, tree_sampler.cpu_seconds] + extra
+                    prefix = [timestamp, process.pid]
+                writer.writerow(row)
+                if live is not None:
+                    live.append(row)
+                if process_writer is not None:
+                    write_process_rows(process_writer, prefix, tree_sampler)
             except psutil.NoSuchProcess:
                 break
-            time.sleep(interval)
+            scheduler.wait()
+    finally:
+        writer.close()
+        if process_writer is not None:
+            process_writer.close()
+        tree_sampler.close()
+    if stats is not None:
+        stats.peak_hwm_mb = max(stats.peak_hwm_mb, tree_sampler.peak_hwm / (1024 * 1024))
+        stats.sampled_cpu_seconds = tree_sampler.cpu_seconds
+    overhead.report()
+    if scheduler.missed:
+        print(f"Sampling fell behind: skipped {scheduler.missed} ticks of {interval}s")
 
-def monitor_process(proc, interval, output_file, command_label=None, command_start_time=None, start_time=None):
+def monitor_process(proc, interval, output_file, command_label=None, command_start_time=None, start_time=None, **options):
     """Monitor a single process"""
-    write_metrics_to_csv(psutil.Process(proc.pid), interval, output_file, command_label, command_start_time, start_time)
+    try:
+        process = psutil.Process(proc.pid)
+    except psutil.NoSuchProcess:
+        # The process already exited and was reaped before sampling started
+        return
+    write_metrics_to_csv(process, interval, output_file, command_label, command_start_time, start_time, **options)
 
-def monitor_process_by_pid(pid, interval, output_file):
+def monitor_process_by_pid(pid, interval, output_file, output_format='csv', segmenting=None, **options):
     """Monitor process by PID"""
     start_time = datetime.now()
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'cpu_percent', 'memory_mb'])
-    write_metrics_to_csv(psutil.Process(pid), interval, output_file, start_time=start_time)
+    write_header(output_file, MONITOR_COLUMNS + tier_metrics(options.get('metrics', 'basic')), output_format, segmenting=segmenting)
+    write_metrics_to_csv(psutil.Process(pid), interval, output_file, start_time=start_time, **options)
 
-def render_single_plot(csv_file, output_file):
-    """Render plot for single process monitoring"""
-    df = pd.read_csv(csv_file)
-    
-    if len(df) < 2:
-        print("Not enough data points to create plot.")
-        return False
-    
-    times = pd.to_datetime(df['timestamp'])
-    mem = df['memory_mb']
-    
-    fig, ax = plt.subplots(figsize=(12, 8))
-    
-    # Convert MB to GB for better readability if values are large
-    mem_gb = mem / 1024 if mem.max() > 1000 else mem
-    mem_label = 'Memory (GB)' if mem.max() > 1000 else 'Memory (MB)'
-    
-    ax.plot(times, mem_gb, 'b-', label=mem_label, linewidth=2)
-    
-    ax.set_xlabel('Timestamp')
-    ax.set_ylabel(mem_label, color='b')
-    ax.tick_params(axis='y', labelcolor='b')
-    
-    # Format x-axis dates
-    fig.autofmt_xdate()
-    
-    plt.title('Process Memory Usage')
-    plt.tight_layout()
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.close(fig)
-    return True
+def launch_command(command, sampler):
+    """Start command, inside a transient cgroup when the cgroup sampler was asked for
 
-def render_comparison_plot(csv_file, output_file):
-    """Render comparison plot for multiple processes"""
-    df = pd.read_csv(csv_file)
-    
-    if len(df) < 2:
-        print("Not enough data points to create plot.")
-        return False
-    
-    # Get unique commands
-    commands = df['command'].unique()
-    
-    fig, ax = plt.subplots(figsize=(14, 8))
-    
-    colors = ['blue', 'red', 'green', 'orange', 'purple']
-    
-    # Determine if we should use GB based on overall max
-    overall_max = df['memory_mb'].max()
-    if overall_max > 1000:
-        mem_unit = 'GB'
-        scale_factor = 1024
+    Returns (Popen, TransientCgroup or None).
+    """
+    cgroup = None
+    if sampler == 'cgroup':
+        cgroup = TransientCgroup.create()
+        if cgroup is None:
+            print("cgroup v2 is not mounted, writable and delegated here; falling back to walking the process tree")
+    proc = subprocess.Popen(cgroup.wrap(command) if cgroup else command)
+    return proc, cgroup
+
+def remove_cgroup(cgroup):
+    """Remove a command's transient cgroup once it is done"""
+    if cgroup is not None and not cgroup.remove():
+        print(f"Leaving cgroup {cgroup.path} in place: processes are still running in it")
+
+def wait_for_exit(proc, stats):
+    """Wait for a Popen'd command and record its kernel resource usage in stats
+
+    Uses wait4 where available, so the command's peak RSS (the largest of it
+    and every descendant it reaped) and its total CPU time, including every
+    reaped descendant however short-lived, come back with the exit status.
+    The kernel counts the forked monitor image from before exec as well, so
+    tiny commands report about the monitor's own RSS.
+    """
+    if not hasattr(os, 'wait4'):
+        proc.wait()
+        return
+    _, status, rusage = os.wait4(proc.pid, 0)
+    # Decoded by hand: os.waitstatus_to_exitcode needs Python 3.9
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
     else:
-        mem_unit = 'MB'
-        scale_factor = 1
+        proc.returncode = os.WEXITSTATUS(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    stats.maxrss_mb = rusage.ru_maxrss * scale / (1024 * 1024)
+    stats.rusage_cpu_seconds = rusage.ru_utime + rusage.ru_stime
+
+def make_adaptive_interval(interval, adaptive, min_interval=None, max_interval=None):
+    """Build the change-driven interval controller, or None when sampling at a fixed rate"""
+    if not adaptive:
+        return None
+    return AdaptiveInterval(interval, min_interval or interval / 10, max_interval or interval * 10)
+
+def find_processes(pattern):
+    """Processes other than this one whose name or command line matches the regex"""
+    regex = re.compile(pattern)
+    found = []
+    for proc in psutil.process_iter(['name', 'cmdline']):
+        if proc.pid == os.getpid():
+            continue
+        cmdline = ' '.join(proc.info['cmdline'] or [])
+        if regex.search(proc.info['name'] or '') or regex.search(cmdline):
+            found.append(proc)
+    return found
+
+def monitor_processes(pids, pattern, interval, output_file, sampler='auto', flush_every=100, flush_ms=1000, max_overhead=None, adaptive=False, min_interval=None, max_interval=None, metrics='basic', expensive_every=10, per_process=None, live=None, rescan_interval=1.0):
+    """Monitor many processes from one sampling loop on a shared clock
+
+    Every tick writes one row per live target, all with the same timestamp.
+    With a pattern, newly started matching processes are picked up every
+    rescan_interval seconds and the loop runs until interrupted; otherwise
+    it ends when the last target exits.
+    """
+    targets = {}
+    
+    def add_target(proc):
+        if proc.pid not in targets:
+            targets[proc.pid] = make_sampler(sampler, proc, tier=metrics, per_process=bool(per_process), expensive_every=expensive_every)
+    
+    for pid in pids:
+        try:
+            add_target(psutil.Process(pid))
+        except psutil.NoSuchProcess:
+            print(f"No process with PID {pid}")
+    
+    scheduler = DeadlineScheduler(interval)
+    overhead = OverheadBudget(scheduler, max_overhead)
+    adaptive_interval = make_adaptive_interval(interval, adaptive, min_interval, max_interval)
+    writer = open_row_writer(output_file, flush_every, flush_ms)
+    process_writer = RowWriter(per_process, flush_every, flush_ms) if per_process else None
+    last_scan = None
+    try:
+        while targets or pattern:
+            if pattern and (last_scan is None or time.monotonic() - last_scan >= rescan_interval):
+                for proc in find_processes(pattern):
+                    add_target(proc)
+                last_scan = time.monotonic()
+            
+            timestamp = datetime.now()
+            rows = []
+            for pid, tree_sampler in list(targets.items()):
+                try:
+                    sample_start = time.perf_counter()
+                    total_cpu, total_mem = tree_sampler.sample()
+                    sample_ms = (time.perf_counter() - sample_start) * 1000
+                except psutil.NoSuchProcess:
+                    tree_sampler.close()
+                    del targets[pid]
+                    continue
+                rows.append([timestamp, total_cpu, total_mem / (1024 * 1024), sample_ms, pid, tree_sampler.peak_hwm / (1024 * 1024), tree_sampler.cpu_seconds] + metric_values(tree_sampler.extra, tree_sampler.metrics))
+                if process_writer is not None:
+                    write_process_rows(process_writer, [timestamp, pid], tree_sampler)
+            
+            # Every row of a tick shares the monitor's cost and interval, and
+            # the interval adapts to the change summed over all targets
+            interval_s = scheduler.interval
+            if adaptive_interval is not None and rows:
+                overhead.base_interval = adaptive_interval.update(sum(row[1] for row in rows), sum(row[2] for row in rows))
+            monitor_cpu = overhead.update()
+            for row in rows:
+                row = row[:5] + [monitor_cpu, interval_s] + row[5:]
+                writer.writerow(row)
+                if live is not None:
+                    live.append(row)
+            scheduler.wait()
+    finally:
+        writer.close()
+        if process_writer is not None:
+            process_writer.close()
+        for tree_sampler in targets.values():
+            tree_sampler.close()
+    overhead.report()
+    if scheduler.missed:
+        print(f"Sampling fell behind: skipped {scheduler.missed} ticks of {interval}s")
+
+def sampling_options(args):
+    """Collect the sampling loop options shared by monitor and compare"""
+    return {
+        'sampler': args.sampler,
+        'flush_every': args.flush_every,
+        'flush_ms': args.flush_ms,
+        'max_overhead': args.max_overhead,
+        'adaptive': args.adaptive,
+        'min_interval': args.min_interval,
+        'max_interval': args.max_interval,
+        'metrics': args.metrics,
+        'expensive_every': args.expensive_every,
+        'per_process': args.per_process,
+        'live': args.live,
+    }
+
+def serve_live(args, columns):
+    """Start the live endpoint asked for with --serve, keeping its buffer on args.live"""
+    from .live import start_live_server
     
-    for i, command in enumerate(commands):
-        command_data = df[df['command'] == command]
-        times = command_data['seconds_elapsed']
-        mem = command_data['memory_mb']
-        
-        # Apply consistent scaling across all commands
-        mem_values = mem / scale_factor
-        
-        color = colors[i % len(colors)]
-        ax.plot(times, mem_values, color=color, label=command, linewidth=2)
-    
-    ax.set_xlabel('Time (seconds since process start)')
-    ax.set_ylabel(f'Memory ({mem_unit})')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    
-    plt.title('Memory Usage Comparison')
-    plt.tight_layout()
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.close(fig)
+    args.live = args.live_server = None
+    if args.serve:
+        args.live, args.live_server = start_live_server(args.serve, columns, args.buffer)
+
+def stop_live(args):
+    if args.live_server is not None:
+        from .live import stop_live_server
+        stop_live_server(args.live, args.live_server)
+
+def segment_options(args):
+    """Compression and rotation settings for write_header, or None for a single output file"""
+    if args.compress == 'none' and not args.rotate_mb and not args.rotate_minutes:
+        return None
+    return {
+        'compression': args.compress,
+        'rotate_bytes': int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None,
+        'rotate_seconds': args.rotate_minutes * 60 if args.rotate_minutes else None,
+    }
+
+def prepare_segments(args):
+    """Point args.output at a manifest when compressing or rotating; False if that cannot work"""
+    args.segmenting = segment_options(args)
+    if args.segmenting is None:
+        return True
+    if args.format == 'binary':
+        print("Compression and rotation apply to CSV output; binary traces are already compact.")
+        return False
+    if args.compress == 'zstd' and not zstandard_available():
+        print("zstd compression needs the zstandard package (pip install zstandard); gzip works without it.")
+        return False
+    args.output = manifest_path(args.output)
     return True
 
+def tolerance(value):
+    """Parse a check tolerance such as 'peak_rss_mb=5%' into (metric, percent)"""
+    from .check import parse_tolerance
+    try:
+        return parse_tolerance(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def live_address(value):
+    """Check a --serve address: a Unix socket path, PORT or a loopback HOST:PORT"""
+    from .live import parse_address
+    try:
+        parse_address(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def percentage(value):
+    """Parse a percentage such as '1%' or '0.5'"""
+    return float(value.rstrip('%'))
+
 def cmd_monitor(args):
-    """Monitor a single process"""
+    """Monitor a command or running processes"""
     # Generate default output filename if not provided
     if not args.output:
         unique_suffix = str(uuid.uuid4())[:8]
-        args.output = f"metrics_{unique_suffix}.csv"
+        args.output = f"metrics_{unique_suffix}.{output_extension(args.format)}"
+    if not prepare_segments(args):
+        return
+    
+    if args.sampler == 'cgroup' and (args.pid or args.match):
+        print("The cgroup sampler only applies to launched commands; walking the process tree instead")
+    
+    extra_columns = tier_metrics(args.metrics)
+    if args.per_process:
+        write_header(args.per_process, PROCESS_COLUMNS + extra_columns)
+    
+    if args.match or (args.pid and len(args.pid) > 1):
+        write_header(args.output, MULTI_MONITOR_COLUMNS + extra_columns, args.format, segmenting=args.segmenting)
+        serve_live(args, MULTI_MONITOR_COLUMNS + extra_columns)
+        try:
+            monitor_processes(args.pid or [], args.match, args.interval, args.output, **sampling_options(args))
+        except KeyboardInterrupt:
+            pass
+        stop_live(args)
+        print(f"Monitoring complete. Metrics written to {args.output}")
+        return
     
     if args.pid:
-        monitor_process_by_pid(args.pid, args.interval, args.output)
+        serve_live(args, MONITOR_COLUMNS + extra_columns)
+        monitor_process_by_pid(args.pid[0], args.interval, args.output, args.format, args.segmenting, **sampling_options(args))
+        stop_live(args)
         print(f"Monitoring complete. Metrics written to {args.output}")
         return
 
@@ -153,160 +394,352 @@ def cmd_monitor(args):
         print("You must specify a command to run or a PID to monitor.")
         return
 
-    # Initialize CSV file
-    with open(args.output, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'cpu_percent', 'memory_mb'])
+    # Initialize output file
+    write_header(args.output, MONITOR_COLUMNS + extra_columns, args.format, segmenting=args.segmenting)
+    serve_live(args, MONITOR_COLUMNS + extra_columns)
 
     start_time = datetime.now()
-    proc = subprocess.Popen(args.command)
-    monitor_thread = threading.Thread(target=monitor_process, args=(proc, args.interval, args.output, None, None, start_time))
+    stats = RunStats()
+    proc, cgroup = launch_command(args.command, args.sampler)
+    monitor_thread = threading.Thread(target=monitor_process, args=(proc, args.interval, args.output, None, None, start_time), kwargs=dict(sampling_options(args), cgroup=cgroup, stats=stats))
     monitor_thread.start()
 
-    proc.wait()
+    wait_for_exit(proc, stats)
     monitor_thread.join()
+    remove_cgroup(cgroup)
+    stop_live(args)
     print(f"Monitoring complete. Metrics written to {args.output}")
+    print(f"Peak memory: sampled {stats.peak_rss_mb:.1f} MB, high-water mark {stats.peak_hwm_mb:.1f} MB", end='')
+    print(f", ru_maxrss {stats.maxrss_mb:.1f} MB" if stats.rusage_cpu_seconds is not None else "")
+    print(f"CPU time: {stats.cpu_seconds:.2f} CPU-seconds")
 
-def cmd_compare(args):
-    """Compare two processes run serially"""
+def compare_runs(args):
+    """Return the (label, command) pairs to compare"""
+    runs = [(label, shlex.split(command)) for label, command in args.run or []]
+    if args.command1:
+        runs.append((args.label1, args.command1))
+    if args.command2:
+        runs.append((args.label2, args.command2))
+    return runs
+
+def run_trial(args, label, command, trial):
+    """Run command once under the monitor and return its RunStats"""
+    stats = RunStats()
+    command_start_time = datetime.now()
+    wall_start = time.perf_counter()
+    proc, cgroup = launch_command(command, args.sampler)
+    monitor_thread = threading.Thread(target=monitor_process, args=(proc, args.interval, args.output, label, command_start_time), kwargs=dict(sampling_options(args), cgroup=cgroup, trial=trial, stats=stats))
+    monitor_thread.start()
+    
+    wait_for_exit(proc, stats)
+    stats.wall_seconds = time.perf_counter() - wall_start
+    monitor_thread.join()
+    remove_cgroup(cgroup)
+    return stats
+
+def run_trials(args, runs):
+    """Warm up, then run every (label, command) args.repeat times; returns {label: [RunStats, ...]}"""
+    # Warmup runs are not monitored
+    for _ in range(args.warmup):
+        for label, command in runs:
+            print(f"Warming up {label}: {' '.join(command)}")
+            subprocess.run(command)
+            time.sleep(args.gap)
+    
+    trials = {label: [] for label, _ in runs}
+    for trial in range(1, args.repeat + 1):
+        order = list(runs)
+        if args.shuffle:
+            random.shuffle(order)
+        for label, command in order:
+            suffix = f" (trial {trial}/{args.repeat})" if args.repeat > 1 else ""
+            print(f"Running {label}{suffix}: {' '.join(command)}")
+            trials[label].append(run_trial(args, label, command, trial))
+            print(f"{label} completed")
+            
+            # Small gap between commands
+            time.sleep(args.gap)
+    return trials
+
+def start_trial_outputs(args, labels, prefix):
+    """Create the outputs of compare or check trials and start --serve; False if they cannot be written"""
     # Generate default output filename if not provided
     if not args.output:
         unique_suffix = str(uuid.uuid4())[:8]
-        args.output = f"comparison_{unique_suffix}.csv"
-    
-    # Initialize CSV file with headers
-    with open(args.output, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['seconds_elapsed', 'cpu_percent', 'memory_mb', 'command'])
-    
-    # Run first command
-    print(f"Running {args.label1}: {' '.join(args.command1)}")
-    command1_start_time = datetime.now()
-    proc1 = subprocess.Popen(args.command1)
-    monitor_thread1 = threading.Thread(target=monitor_process, args=(proc1, args.interval, args.output, args.label1, command1_start_time))
-    monitor_thread1.start()
-    
-    proc1.wait()
-    monitor_thread1.join()
-    print(f"{args.label1} completed")
-    
-    # Small gap between commands
-    time.sleep(0.5)
+        args.output = f"{prefix}_{unique_suffix}.{output_extension(args.format)}"
+    if not prepare_segments(args):
+        return False
     
-    # Run second command
-    print(f"Running {args.label2}: {' '.join(args.command2)}")
-    command2_start_time = datetime.now()
-    proc2 = subprocess.Popen(args.command2)
-    monitor_thread2 = threading.Thread(target=monitor_process, args=(proc2, args.interval, args.output, args.label2, command2_start_time))
-    monitor_thread2.start()
+    # Initialize output file with headers
+    write_header(args.output, COMPARE_COLUMNS + tier_metrics(args.metrics), args.format, labels, args.segmenting)
+    if args.per_process:
+        write_header(args.per_process, COMPARE_PROCESS_COLUMNS + tier_metrics(args.metrics))
+    serve_live(args, COMPARE_COLUMNS + tier_metrics(args.metrics))
+    return True
+
+def cmd_compare(args):
+    """Compare processes run serially, optionally over repeated trials"""
+    runs = compare_runs(args)
+    if len(runs) < 2:
+        print("You must specify at least two commands to compare (--run LABEL COMMAND, or --command1/--command2).")
+        return
+    labels = [label for label, _ in runs]
+    if len(set(labels)) < len(labels):
+        print("Each command must have a distinct label.")
+        return
     
-    proc2.wait()
-    monitor_thread2.join()
-    print(f"{args.label2} completed")
+    if not start_trial_outputs(args, labels, 'comparison'):
+        return
     
+    trials = run_trials(args, runs)
+    stop_live(args)
     print(f"Comparison complete. Metrics written to {args.output}")
     
+    rows = summarize(trials)
+    print()
+    print_summary(rows)
+    base = args.output[:-len('.manifest.json')] if is_manifest(args.output) else os.path.splitext(args.output)[0]
+    summary_file = f"{base}_summary.csv"
+    write_summary(summary_file, rows)
+    print(f"Summary written to {summary_file}")
+    
     # Auto-render if requested
     if args.render:
+        from .plots import render_comparison_plot
+        
         # Generate plot filename from labels with unique suffix
-        safe_label1 = "".join(c for c in args.label1 if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        safe_label2 = "".join(c for c in args.label2 if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        safe_labels = ["".join(c for c in label if c.isalnum() or c in (' ', '-', '_')).rstrip() for label in labels]
         unique_suffix = str(uuid.uuid4())[:8]
-        plot_filename = f"{safe_label1}_vs_{safe_label2}_{unique_suffix}.png".replace(' ', '_')
+        plot_filename = f"{'_vs_'.join(safe_labels)}_{unique_suffix}.png".replace(' ', '_')
         
         if render_comparison_plot(args.output, plot_filename):
             print(f"Comparison plot saved to {plot_filename}")
         else:
             print("Failed to create comparison plot.")
 
+def cmd_check(args):
+    """Run commands like compare and fail on a regression against a stored baseline"""
+    from .check import new_baseline, read_baseline, write_baseline, record_trials, check_against_baseline, print_check, regressed
+    
+    runs = [(label, shlex.split(command)) for label, command in args.run]
+    labels = [label for label, _ in runs]
+    if len(set(labels)) < len(labels):
+        print("Each command must have a distinct label.")
+        sys.exit(2)
+    if not args.update and not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} does not exist; record one with --update.")
+        sys.exit(2)
+    
+    if not start_trial_outputs(args, labels, 'check'):
+        sys.exit(2)
+    trials = run_trials(args, runs)
+    stop_live(args)
+    print(f"Metrics written to {args.output}")
+    print()
+    
+    if args.update:
+        baseline = read_baseline(args.baseline) if os.path.exists(args.baseline) else new_baseline()
+        baseline['tolerances'].update(dict(args.tolerance or []))
+        for label, command in args.run:
+            record_trials(baseline, label, command, trials[label])
+        write_baseline(args.baseline, baseline)
+        print_summary(summarize(trials))
+        print(f"Baseline written to {args.baseline}")
+        return
+    
+    results, notes = check_against_baseline(read_baseline(args.baseline), trials, dict(args.tolerance or []), args.alpha)
+    print_check(results, notes, args.alpha)
+    failures = regressed(results)
+    print()
+    if failures:
+        print(f"FAILED: {len(failures)} regression(s) against {args.baseline}")
+        sys.exit(1)
+    print(f"OK: no regressions against {args.baseline}")
+
+def render_cache(args):
+    """The render cache selected by the render options, or None with --no-cache"""
+    if args.no_cache:
+        return None
+    from .cache import RenderCache
+    return RenderCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+def cmd_render_batch(args):
+    """Render many metrics files in parallel worker processes"""
+    from .batch import expand_inputs, render_batch, print_timings, worker_count, write_index
+    
+    inputs = expand_inputs(args.input)
+    if not inputs:
+        print(f"No metrics files match {' '.join(args.input)}")
+        return
+    
+    start = time.perf_counter()
+    cache = render_cache(args)
+    results = render_batch(inputs, args.output_dir, args.downsample, args.max_points, args.jobs, cache and (cache.directory, cache.max_bytes), args.delta, (args.start, args.end))
+    rendered = sum(1 for result in results if result[2] != 'cached')
+    print_timings(results, time.perf_counter() - start, worker_count(args.jobs, rendered))
+    if args.index:
+        write_index(results, args.index)
+        print(f"Index written to {args.index}")
+
 def cmd_render(args):
     """Render plot from CSV data"""
-    # Generate default output filename if not provided
-    if not args.output:
-        unique_suffix = str(uuid.uuid4())[:8]
-        base_name = os.path.splitext(os.path.basename(args.input))[0]
-        args.output = f"{base_name}_plot_{unique_suffix}.png"
+    from .batch import is_pattern
+    
+    if len(args.input) > 1 or is_pattern(args.input[0]) or os.path.isdir(args.input[0]) or args.output_dir or args.index:
+        if args.watch:
+            print("Watch mode takes a single input file.")
+            return
+        cmd_render_batch(args)
+        return
+    args.input = args.input[0]
     
     if args.watch:
+        from .watch import watch_render
+        
+        if is_manifest(args.input):
+            print("Watch mode needs a single CSV file or binary trace.")
+            return
+        
+        if not args.output:
+            unique_suffix = str(uuid.uuid4())[:8]
+            base_name = os.path.splitext(os.path.basename(args.input))[0]
+            args.output = f"{base_name}_plot_{unique_suffix}.png"
         print(f"Watch mode: updating plot every 1 second. Press Ctrl+C to stop.")
         try:
-            while True:
-                if os.path.exists(args.input):
-                    # Determine plot type based on CSV format
-                    try:
-                        df = pd.read_csv(args.input, nrows=1)
-                        if len(df) > 0:
-                            if 'command' in df.columns:
-                                # Comparison plot
-                                if render_comparison_plot(args.input, args.output):
-                                    print(f"Comparison plot updated: {args.output}")
-                                else:
-                                    print("Waiting for more data...")
-                            else:
-                                # Single process plot
-                                if render_single_plot(args.input, args.output):
-                                    print(f"Plot updated: {args.output}")
-                                else:
-                                    print("Waiting for more data...")
-                        else:
-                            print("Waiting for data...")
-                    except (pd.errors.EmptyDataError, pd.errors.ParserError):
-                        print("Waiting for valid data...")
-                else:
-                    print(f"Waiting for CSV file: {args.input}")
-                time.sleep(1)
+            watch_render(args.input, args.output, args.downsample, args.max_points)
         except KeyboardInterrupt:
             print("\nWatch mode stopped.")
+        return
+    
+    if not os.path.exists(args.input):
+        print(f"Input file {args.input} does not exist.")
+        return
+    
+    cache = render_cache(args)
+    window = [args.start, args.end]
+    key = cache.key(args.input, downsample=args.downsample, max_points=args.max_points, delta=args.delta, window=window) if cache else None
+    
+    # Generate default output filename if not provided; with the cache it is
+    # named after the cache key, so unchanged data maps to the same file
+    if not args.output:
+        unique_suffix = key[:8] if key else str(uuid.uuid4())[:8]
+        base_name = os.path.splitext(os.path.basename(args.input))[0]
+        args.output = f"{base_name}_plot_{unique_suffix}.png"
+    
+    if cache is not None and cache.get(key, args.output):
+        print(f"Plot is up to date (cached render): {args.output}")
+        return
+    
+    from .plots import render_metrics
+    
+    kind = render_metrics(args.input, args.output, args.downsample, args.max_points, delta=args.delta, start=args.start, end=args.end)
+    if kind == 'comparison':
+        print(f"Comparison plot saved to {args.output}")
+    elif kind:
+        print(f"Plot saved to {args.output}")
     else:
-        if not os.path.exists(args.input):
-            print(f"Input file {args.input} does not exist.")
-            return
-        
-        # Determine plot type based on CSV format
-        df = pd.read_csv(args.input, nrows=1)
-        if 'command' in df.columns:
-            # Comparison plot
-            if render_comparison_plot(args.input, args.output):
-                print(f"Comparison plot saved to {args.output}")
-            else:
-                print("Failed to create comparison plot.")
-        else:
-            # Single process plot
-            if render_single_plot(args.input, args.output):
-                print(f"Plot saved to {args.output}")
-            else:
-                print("Failed to create plot.")
+        print("Failed to create plot.")
+    if kind and cache is not None:
+        cache.put(key, args.output)
+
+def cmd_convert(args):
+    """Convert a CSV file to a binary trace or back"""
+    from .trace import csv_to_trace, trace_to_csv
+    
+    if not os.path.exists(args.input):
+        print(f"Input file {args.input} does not exist.")
+        return
+    
+    if is_trace(args.input):
+        rows = trace_to_csv(args.input, args.output)
+        print(f"Converted {rows} samples to CSV: {args.output}")
+    else:
+        rows = csv_to_trace(args.input, args.output)
+        print(f"Converted {rows} samples to binary trace: {args.output}")
 
 def main():
     parser = argparse.ArgumentParser(description='Process monitoring and plotting tool')
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
+    # Sampling options shared by monitor, compare and check
+    sampling_parser = argparse.ArgumentParser(add_help=False)
+    sampling_parser.add_argument('--interval', type=float, default=0.1, help='Sampling interval in seconds')
+    sampling_parser.add_argument('--output', help='CSV file to write metrics to (default: auto-generated with unique suffix)')
+    sampling_parser.add_argument('--sampler', choices=SAMPLERS, default='auto', help='Sampling backend: procfs reads /proc directly on Linux, psutil works everywhere, cgroup runs the command in a cgroup v2 subtree (default: auto)')
+    sampling_parser.add_argument('--flush-every', type=int, default=100, help='Flush the output file after this many rows')
+    sampling_parser.add_argument('--flush-ms', type=float, default=1000, help='Flush the output file at least this often, in milliseconds')
+    sampling_parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help='Output format: csv text or a compact binary trace')
+    sampling_parser.add_argument('--max-overhead', type=percentage, help='CPU budget for the monitor itself, e.g. 1%%; the interval is stretched to stay under it')
+    sampling_parser.add_argument('--adaptive', action='store_true', help='Sample faster while memory or CPU change quickly and slower while they are flat')
+    sampling_parser.add_argument('--min-interval', type=float, help='Shortest adaptive interval in seconds (default: interval / 10)')
+    sampling_parser.add_argument('--max-interval', type=float, help='Longest adaptive interval in seconds (default: interval * 10)')
+    sampling_parser.add_argument('--metrics', choices=METRIC_TIERS, default='basic', help='Metric tier: cheap adds threads, open fds, context switches and I/O; expensive also adds USS and PSS (default: basic, CPU and RSS only)')
+    sampling_parser.add_argument('--expensive-every', type=int, default=10, help='Read the expensive tier every this many ticks')
+    sampling_parser.add_argument('--compress', choices=COMPRESSIONS, default='none', help='Stream CSV output through gzip or zstd into segments listed in a .manifest.json')
+    sampling_parser.add_argument('--rotate-mb', type=float, help='Start a new CSV segment once the current one reaches this many MB on disk')
+    sampling_parser.add_argument('--rotate-minutes', type=float, help='Start a new CSV segment at least this often')
+    sampling_parser.add_argument('--serve', type=live_address, metavar='ADDRESS', help='Serve recent samples live on localhost PORT or loopback HOST:PORT, or a Unix socket path: / live page, /snapshot, /stream (NDJSON), /events (SSE)')
+    sampling_parser.add_argument('--buffer', type=int, default=10000, help='Samples kept in memory for --serve')
+    sampling_parser.add_argument('--per-process', metavar='FILE', help='Also write one CSV row per process per tick to FILE, to attribute usage within the tree')
+    
     # Monitor subcommand
-    monitor_parser = subparsers.add_parser('monitor', help='Monitor a single process')
+    monitor_parser = subparsers.add_parser('monitor', parents=[sampling_parser], help='Monitor a command or running processes')
     monitor_parser.add_argument('command', nargs='*', help='Command to run')
-    monitor_parser.add_argument('--pid', type=int, help='PID of the process to monitor')
-    monitor_parser.add_argument('--interval', type=float, default=0.1, help='Sampling interval in seconds')
-    monitor_parser.add_argument('--output', help='CSV file to write metrics to (default: auto-generated with unique suffix)')
+    monitor_parser.add_argument('--pid', type=int, action='append', help='PID of a process to monitor (repeatable)')
+    monitor_parser.add_argument('--match', help='Also monitor every process whose name or command line matches this regex, until interrupted')
     monitor_parser.set_defaults(func=cmd_monitor)
     
     # Compare subcommand
-    compare_parser = subparsers.add_parser('compare', help='Compare two processes run serially')
-    compare_parser.add_argument('--command1', nargs='+', required=True, help='First command to run')
-    compare_parser.add_argument('--command2', nargs='+', required=True, help='Second command to run')
-    compare_parser.add_argument('--interval', type=float, default=0.1, help='Sampling interval in seconds')
-    compare_parser.add_argument('--output', help='CSV file to write metrics to (default: auto-generated with unique suffix)')
+    compare_parser = subparsers.add_parser('compare', parents=[sampling_parser], help='Compare processes run serially')
+    compare_parser.add_argument('--run', nargs=2, action='append', metavar=('LABEL', 'COMMAND'), help='Labeled command to compare, as a shell-quoted string (repeatable)')
+    compare_parser.add_argument('--command1', nargs='+', help='First command to run')
+    compare_parser.add_argument('--command2', nargs='+', help='Second command to run')
     compare_parser.add_argument('--label1', default='Command 1', help='Label for first command')
     compare_parser.add_argument('--label2', default='Command 2', help='Label for second command')
+    compare_parser.add_argument('--repeat', type=int, default=1, help='Number of monitored trials per command')
+    compare_parser.add_argument('--warmup', type=int, default=0, help='Unmonitored warmup runs per command before the trials')
+    compare_parser.add_argument('--shuffle', action='store_true', help='Randomize the order of commands within each trial')
+    compare_parser.add_argument('--gap', type=float, default=0.5, help='Pause between runs in seconds')
     compare_parser.add_argument('--render', action='store_true', help='Automatically render plot after comparison')
     compare_parser.set_defaults(func=cmd_compare)
     
+    # Check subcommand
+    check_parser = subparsers.add_parser('check', parents=[sampling_parser], help='Fail when commands regress against a stored baseline')
+    check_parser.add_argument('--run', nargs=2, action='append', required=True, metavar=('LABEL', 'COMMAND'), help='Labeled command to check, as a shell-quoted string (repeatable)')
+    check_parser.add_argument('--baseline', required=True, help='Baseline JSON file holding the trials of earlier runs')
+    check_parser.add_argument('--update', action='store_true', help='Record this run as the baseline of its commands instead of checking')
+    check_parser.add_argument('--tolerance', type=tolerance, action='append', metavar='METRIC=PERCENT', help='Allowed increase of a median over the baseline, e.g. peak_memory_mb=5%% (repeatable; with --update, stored in the baseline)')
+    check_parser.add_argument('--alpha', type=float, default=0.05, help='Significance level of the permutation test between baseline and current trials')
+    check_parser.add_argument('--repeat', type=int, default=5, help='Number of monitored trials per command')
+    check_parser.add_argument('--warmup', type=int, default=1, help='Unmonitored warmup runs per command before the trials')
+    check_parser.add_argument('--shuffle', action='store_true', help='Randomize the order of commands within each trial')
+    check_parser.add_argument('--gap', type=float, default=0.5, help='Pause between runs in seconds')
+    check_parser.set_defaults(func=cmd_check)
+    
     # Render subcommand
     render_parser = subparsers.add_parser('render', help='Render plot from CSV data')
-    render_parser.add_argument('--input', default='metrics.csv', help='Input CSV file')
-    render_parser.add_argument('--output', help='Output PNG file (default: auto-generated with unique suffix)')
+    render_parser.add_argument('--input', nargs='+', default=['metrics.csv'], help='Input CSV files, binary traces or segment manifests; globs and directories render a batch in parallel')
+    render_parser.add_argument('--output', help='Output PNG file for a single input (default: auto-generated with unique suffix)')
+    render_parser.add_argument('--output-dir', help='Directory for batch output PNGs (default: next to each input)')
+    render_parser.add_argument('--jobs', type=int, help='Worker processes for a batch (default: one per core)')
+    render_parser.add_argument('--from', dest='start', help='Plot only samples from this time on: a date for monitor output, seconds for comparisons')
+    render_parser.add_argument('--to', dest='end', help='Plot only samples up to this time')
+    render_parser.add_argument('--delta', action='store_true', help='For comparisons, add panels of the difference from the first command and of cumulative memory-time, on a common time grid')
+    render_parser.add_argument('--no-cache', action='store_true', help='Always re-render instead of reusing a cached PNG of unchanged data')
+    render_parser.add_argument('--cache-dir', help='Render cache directory (default: ~/.cache/process-plot/renders)')
+    render_parser.add_argument('--cache-size', type=float, default=DEFAULT_CACHE_SIZE_MB, help='Evict least recently used renders beyond this many MB')
+    render_parser.add_argument('--index', metavar='FILE', help='After a batch, write an HTML index page, or a contact sheet if FILE ends in .png')
     render_parser.add_argument('--watch', action='store_true', help='Watch mode: continuously update plot every 1 second')
+    render_parser.add_argument('--downsample', choices=DOWNSAMPLE_MODES, default='minmax', help='Reduce long traces before plotting: minmax keeps every spike, lttb keeps the visual shape')
+    render_parser.add_argument('--max-points', type=int, help='Points to plot per line (default: two per pixel of output width)')
     render_parser.set_defaults(func=cmd_render)
     
+    # Convert subcommand
+    convert_parser = subparsers.add_parser('convert', help='Convert between CSV metrics and binary traces')
+    convert_parser.add_argument('--input', required=True, help='Input CSV file or binary trace')
+    convert_parser.add_argument('--output', required=True, help='Output file in the other format')
+    convert_parser.set_defaults(func=cmd_convert)
+    
     args = parser.parse_args()
     
     if not hasattr(args, 'func'):
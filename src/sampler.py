@@ -0,0 +1,574 @@
+import os
+import time
+import psutil
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+SAMPLERS = ('auto', 'psutil', 'procfs', 'cgroup')
+METRIC_TIERS = ('basic', 'cheap', 'expensive')
+CHEAP_METRICS = ['threads', 'fds', 'ctx_switches', 'io_read_mb', 'io_write_mb']
+EXPENSIVE_METRICS = ['uss_mb', 'pss_mb']
+
+def tier_metrics(tier):
+    """Extra metric columns collected by a tier on top of CPU and RSS"""
+    if tier == 'expensive':
+        return CHEAP_METRICS + EXPENSIVE_METRICS
+    if tier == 'cheap':
+        return list(CHEAP_METRICS)
+    return []
+
+def parse_hwm(status):
+    """Peak RSS in bytes from the contents of /proc/<pid>/status, or 0"""
+    start = status.find(b'VmHWM:')
+    if start < 0:
+        return 0
+    return int(status[start + 6:status.index(b'kB', start)]) * 1024
+
+def status_field(status, name):
+    """Integer value of a field of /proc/<pid>/status, or 0"""
+    start = status.find(name + b':')
+    if start < 0:
+        return 0
+    return int(status[start + len(name) + 1:status.index(b'\n', start)].split()[0])
+
+def parse_io(io):
+    """(read_bytes, write_bytes) from the contents of /proc/<pid>/io"""
+    return status_field(io, b'read_bytes'), status_field(io, b'write_bytes')
+
+def parse_smaps_rollup(rollup):
+    """(uss_bytes, pss_bytes) from the contents of /proc/<pid>/smaps_rollup"""
+    uss = status_field(rollup, b'Private_Clean') + status_field(rollup, b'Private_Dirty')
+    return uss * 1024, status_field(rollup, b'Pss') * 1024
+
+class TreeSampler:
+    """Cumulative CPU accounting and metric tiers shared by the sampler backends
+
+    Each tick a backend sums, over every live process in the tree, its own
+    CPU time plus the time of the children it has reaped (cutime/cstime).
+    When a child exits and is reaped, its whole CPU time moves into its
+    parent's reaped-children counters, so the sum only ever grows by CPU
+    actually spent in the tree, including by processes that started and
+    exited between two ticks. CPU percent is the delta of that sum over
+    the wall time between ticks, and cpu_seconds accumulates it.
+
+    Beyond CPU and RSS a backend collects the metrics of its tier (see
+    tier_metrics) into extra, summed over the tree. The expensive USS and
+    PSS figures are only refreshed every expensive_every ticks, and on a
+    process's first tick, and carried forward in between. With per_process, processes holds one
+    (pid, name, cpu_percent, rss_bytes, metrics) record per process of the
+    last tick. Metrics a platform cannot provide are NaN.
+
+    peak_hwm is the largest kernel high-water mark (VmHWM, Linux only) or
+    sampled RSS of any single process in the tree. VmHWM is read every
+    tick for the root, but for other processes only on their first tick
+    and every hwm_every ticks, since the status file costs several times
+    the stat file. For a launched command wait4's ru_maxrss covers every
+    reaped descendant exactly anyway.
+    """
+
+    def __init__(self, tier='basic', per_process=False, expensive_every=10, hwm_every=10):
+        self.cpu_seconds = 0.0
+        self.peak_hwm = 0
+        self.tier = tier
+        self.per_process = per_process
+        self.expensive_every = max(1, expensive_every)
+        self.hwm_every = max(1, hwm_every)
+        self.metrics = tier_metrics(tier)
+        self.extra = {metric: float('nan') for metric in self.metrics}
+        self.processes = []
+        self._last_total = None
+        self._last_time = None
+        self._ticks = 0
+        self._process_last = {}
+        self._expensive = {}
+
+    @property
+    def detailed(self):
+        """Whether this tick must collect per-process records"""
+        return bool(self.metrics) or self.per_process
+
+    def _expensive_due(self):
+        return self.tier == 'expensive' and self._ticks % self.expensive_every == 0
+
+    def _hwm_due(self):
+        return self._ticks % self.hwm_every == 0
+
+    def _account_cpu(self, total_seconds, now):
+        """Record the tree's cumulative CPU time and return CPU percent since the last tick"""
+        percent = 0.0
+        if self._last_total is not None:
+            # A process that left the tree without being reaped inside it takes its time along
+            delta = max(0.0, total_seconds - self._last_total)
+            self.cpu_seconds += delta
+            if now > self._last_time:
+                percent = delta / (now - self._last_time) * 100
+        self._last_total = total_seconds
+        self._last_time = now
+        self._ticks += 1
+        return percent
+
+    def _account_processes(self, records, now):
+        """Sum per-process metrics into extra and keep the records if asked for
+
+        records holds (pid, name, cumulative_cpu_seconds, rss_bytes, metrics)
+        tuples; USS and PSS left out of metrics are carried forward from the
+        last tick that read them.
+        """
+        totals = {metric: None for metric in self.metrics}
+        processes = []
+        process_last = {}
+        expensive = {}
+        for pid, name, cpu_total, rss, metrics in records:
+            if self.tier == 'expensive':
+                if 'uss_mb' in metrics:
+                    expensive[pid] = (metrics['uss_mb'], metrics['pss_mb'])
+                else:
+                    metrics['uss_mb'], metrics['pss_mb'] = expensive[pid] = self._expensive.get(pid, (None, None))
+            for metric in self.metrics:
+                value = metrics.get(metric)
+                if value is not None:
+                    totals[metric] = (totals[metric] or 0) + value
+            if self.per_process:
+                percent = 0.0
+                last = self._process_last.get(pid)
+                if last is not None and now > last[1]:
+                    percent = max(0.0, cpu_total - last[0]) / (now - last[1]) * 100
+                process_last[pid] = (cpu_total, now)
+                processes.append((pid, name, percent, rss, metrics))
+        self.extra = {metric: float('nan') if value is None else value for metric, value in totals.items()}
+        self.processes = processes
+        self._process_last = process_last
+        self._expensive = expensive
+
+class PsutilSampler(TreeSampler):
+    """Sample a process tree through psutil
+
+    The tree is tracked across ticks from births and deaths in
+    psutil.pids(): a pid seen for the first time gets a Process object
+    once, and joins the tree if its parent is in it. A steady tree
+    therefore costs one directory listing and no Process construction per
+    tick. Processes stay in the tree when their parent exits, so
+    daemonized grandchildren are still counted.
+
+    A pid is only trusted while the process holding it has the creation
+    time it joined with, since psutil's cpu_times and memory_info do not
+    notice a pid reused by an unrelated process. On Linux the check is a
+    pread of a /proc/<pid>/stat descriptor kept open from the pid's first
+    tick, which also fails once that process is reaped; elsewhere it costs
+    a fresh Process per tree member per tick. VmHWM is read through a kept
+    descriptor as well.
+    """
+
+    def __init__(self, process, **options):
+        super().__init__(**options)
+        self.process = process
+        self._known = {}
+        self._outside = set()
+        self._fds = {}
+        # psutil's creation time on Linux is the stat file's start time plus this;
+        # None where there is no /proc to read
+        self._boot_time = psutil.boot_time() if os.path.exists(f'/proc/{process.pid}/stat') else None
+
+    def _create_time(self, pid):
+        """Creation time of whatever process holds pid now, as psutil reports it, or None"""
+        if self._boot_time is None:
+            try:
+                return psutil.Process(pid).create_time()
+            except psutil.NoSuchProcess:
+                return None
+        stat = self._read(pid, 'stat')
+        if stat is None:
+            self._drop(pid)
+            return None
+        # starttime, in clock ticks since boot, is field 19 after the parenthesised comm
+        return float(stat[stat.rindex(b')') + 2:].split()[19]) / CLOCK_TICKS + self._boot_time
+
+    def _read(self, pid, name):
+        """Read /proc/<pid>/<name> through a descriptor kept open across ticks, or None"""
+        fd = self._fds.get((pid, name))
+        try:
+            if fd is None:
+                fd = self._fds[pid, name] = os.open(f'/proc/{pid}/{name}', os.O_RDONLY)
+            return os.pread(fd, 4096, 0) or None
+        except OSError:
+            return None
+
+    def _drop(self, pid):
+        for name in ('stat', 'status'):
+            fd = self._fds.pop((pid, name), None)
+            if fd is not None:
+                os.close(fd)
+
+    def _join(self, proc):
+        try:
+            self._known[proc.pid] = (proc, proc.create_time())
+        except psutil.NoSuchProcess:
+            pass
+
+    def _update_tree(self):
+        """Bring the {pid: (Process, create_time)} of the tree up to date with the running pids"""
+        pids = set(psutil.pids())
+        if not self._known:
+            tree = [self.process]
+            try:
+                tree.extend(self.process.children(recursive=True))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+            for proc in tree:
+                self._join(proc)
+            self._outside = pids - self._known.keys()
+            return
+        for pid in [pid for pid in self._known if pid not in pids and pid != self.process.pid]:
+            del self._known[pid]
+            self._drop(pid)
+        self._outside &= pids
+
+        born = {}
+        for pid in pids - self._known.keys() - self._outside:
+            try:
+                proc = psutil.Process(pid)
+                born[pid] = (proc, proc.ppid())
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        # A new process may be the child of another new one, so repeat until nothing joins
+        joined = True
+        while joined:
+            joined = False
+            for pid, (proc, ppid) in list(born.items()):
+                if ppid in self._known:
+                    self._join(proc)
+                    del born[pid]
+                    joined = True
+        self._outside.update(born)
+
+    def sample(self):
+        """Return (cpu_percent, rss_bytes) summed over the process tree"""
+        now = time.monotonic()
+        known = {}
+        records = []
+        expensive = self._expensive_due()
+        hwm = self._boot_time is not None and self._hwm_due()
+        total_seconds = 0.0
+        total_mem = 0
+
+        self._update_tree()
+        for pid, (proc, created) in self._known.items():
+            if self._create_time(pid) != created:
+                # Gone, or reused by a process that joins the tree only if its parent is in it
+                if pid == self.process.pid:
+                    raise psutil.NoSuchProcess(pid)
+                continue
+            try:
+                with proc.oneshot():
+                    if pid == self.process.pid and proc.status() == psutil.STATUS_ZOMBIE:
+                        raise psutil.NoSuchProcess(pid)
+                    cpu_times = proc.cpu_times()
+                    rss = proc.memory_info().rss
+                    if self.detailed:
+                        name = proc.name()
+                        metrics = self._metrics(proc, expensive or pid not in self._expensive)
+                self.peak_hwm = max(self.peak_hwm, rss)
+                if self._boot_time is not None and (hwm or pid == self.process.pid or (pid, 'status') not in self._fds):
+                    status = self._read(pid, 'status')
+                    self.peak_hwm = max(self.peak_hwm, parse_hwm(status) if status else 0)
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                if pid == self.process.pid:
+                    raise psutil.NoSuchProcess(pid)
+                if isinstance(e, psutil.AccessDenied):
+                    # Still in the tree, so its children keep joining it
+                    known[pid] = (proc, created)
+                continue
+            known[pid] = (proc, created)
+            cpu_total = cpu_times.user + cpu_times.system + cpu_times.children_user + cpu_times.children_system
+            total_seconds += cpu_total
+            total_mem += rss
+            if self.detailed:
+                records.append((pid, name, cpu_total, rss, metrics))
+
+        self._known = known
+        for pid, _ in list(self._fds):
+            if pid not in known:
+                self._drop(pid)
+        percent = self._account_cpu(total_seconds, now)
+        if self.detailed:
+            self._account_processes(records, now)
+        return percent, total_mem
+
+    def _metrics(self, proc, expensive):
+        """Tier metrics of one process; a metric the platform or permissions deny is None"""
+        metrics = {}
+        if not self.metrics:
+            return metrics
+        metrics['threads'] = proc.num_threads()
+        metrics['ctx_switches'] = sum(proc.num_ctx_switches())
+        try:
+            metrics['fds'] = proc.num_fds() if hasattr(proc, 'num_fds') else proc.num_handles()
+        except psutil.AccessDenied:
+            metrics['fds'] = None
+        try:
+            io = proc.io_counters()
+            metrics['io_read_mb'] = io.read_bytes / (1024 * 1024)
+            metrics['io_write_mb'] = io.write_bytes / (1024 * 1024)
+        except (AttributeError, psutil.AccessDenied):
+            metrics['io_read_mb'] = metrics['io_write_mb'] = None
+        if expensive:
+            try:
+                full = proc.memory_full_info()
+                metrics['uss_mb'] = full.uss / (1024 * 1024)
+                metrics['pss_mb'] = full.pss / (1024 * 1024) if hasattr(full, 'pss') else None
+            except psutil.AccessDenied:
+                metrics['uss_mb'] = metrics['pss_mb'] = None
+        return metrics
+
+    def close(self):
+        for pid, _ in list(self._fds):
+            self._drop(pid)
+        self._known = {}
+        self._outside = set()
+
+class ProcfsSampler(TreeSampler):
+    """Sample a process tree by reading /proc directly (Linux only)
+
+    The tree is walked through /proc/<pid>/task/<tid>/children and each
+    process contributes a single read of its stat file, which carries CPU
+    times, RSS and the thread count. File descriptors are kept open between
+    ticks and re-read with pread, so a steady tree costs no opens and no
+    psutil objects. The status file is read as well for VmHWM, at the
+    cadence TreeSampler describes unless the cheap tier needs it every tick.
+
+    The cheap tier adds the io file and a listing of the fd directory per
+    process; thread and context switch counts come from files already read.
+    The expensive tier reads smaps_rollup, which makes the kernel walk every
+    mapping, so it only happens every expensive_every ticks.
+    """
+
+    def __init__(self, pid, **options):
+        super().__init__(**options)
+        self.pid = pid
+        self._fds = {}
+
+    @staticmethod
+    def available(pid):
+        """Whether /proc exposes the child lists this sampler relies on"""
+        return os.path.exists(f'/proc/{pid}/task/{pid}/children')
+
+    def _read(self, path, seen, size=4096):
+        """Read a /proc file through a cached descriptor, or None if it is gone"""
+        seen.add(path)
+        fd = self._fds.get(path)
+        try:
+            if fd is None:
+                fd = os.open(path, os.O_RDONLY)
+                self._fds[path] = fd
+            data = os.pread(fd, size, 0)
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(path)
+            return None
+        return data
+
+    def _drop(self, path):
+        fd = self._fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _children(self, pid, num_threads, seen):
+        if num_threads == 1:
+            # Skip listing the task directory for the common single-threaded case
+            tids = [pid]
+        else:
+            try:
+                tids = os.listdir(f'/proc/{pid}/task')
+            except OSError:
+                return []
+        kids = []
+        for tid in tids:
+            path = f'/proc/{pid}/task/{tid}/children'
+            data = self._read(path, seen)
+            if data and len(data) == 4096:
+                data = self._read(path, seen, 1 << 20)
+            if data:
+                kids.extend(int(child) for child in data.split())
+        return kids
+
+    def sample(self):
+        """Return (cpu_percent, rss_bytes) summed over the process tree"""
+        seen = set()
+        now = time.monotonic()
+        records = []
+        expensive = self._expensive_due()
+        hwm = self._hwm_due()
+        total_ticks = 0
+        total_mem = 0
+
+        stack = [self.pid]
+        while stack:
+            pid = stack.pop()
+            stat = self._read(f'/proc/{pid}/stat', seen)
+            if stat is None:
+                if pid == self.pid:
+                    self.close()
+                    raise psutil.NoSuchProcess(pid)
+                continue
+
+            # Fields after the parenthesised comm, numbered from state = 0: utime 11,
+            # stime 12, cutime 13, cstime 14, num_threads 17, rss pages 21
+            fields = stat[stat.rindex(b')') + 2:].split()
+            if pid == self.pid and fields[0] == b'Z':
+                self.close()
+                raise psutil.NoSuchProcess(pid)
+            ticks = int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14])
+            total_ticks += ticks
+            rss = int(fields[21]) * PAGE_SIZE
+            total_mem += rss
+            status_path = f'/proc/{pid}/status'
+            if hwm or self.metrics or pid == self.pid or status_path not in self._fds:
+                status = self._read(status_path, seen)
+                self.peak_hwm = max(self.peak_hwm, parse_hwm(status) if status else 0, rss)
+            else:
+                # Not due: keep the descriptor for the tick that is
+                seen.add(status_path)
+                status = None
+                self.peak_hwm = max(self.peak_hwm, rss)
+            if self.detailed:
+                name = stat[stat.index(b'(') + 1:stat.rindex(b')')].decode(errors='replace')
+                records.append((pid, name, ticks / CLOCK_TICKS, rss, self._metrics(pid, fields, status, expensive or pid not in self._expensive, seen)))
+
+            stack.extend(self._children(pid, int(fields[17]), seen))
+
+        for path in list(self._fds):
+            if path not in seen:
+                self._drop(path)
+
+        percent = self._account_cpu(total_ticks / CLOCK_TICKS, now)
+        if self.detailed:
+            self._account_processes(records, now)
+        return percent, total_mem
+
+    def _metrics(self, pid, fields, status, expensive, seen):
+        """Tier metrics of one process; a file the monitor may not read gives None"""
+        metrics = {}
+        if not self.metrics:
+            return metrics
+        metrics['threads'] = int(fields[17])
+        metrics['ctx_switches'] = status_field(status, b'voluntary_ctxt_switches') + status_field(status, b'nonvoluntary_ctxt_switches') if status else None
+        try:
+            metrics['fds'] = len(os.listdir(f'/proc/{pid}/fd'))
+        except OSError:
+            metrics['fds'] = None
+        io = self._read(f'/proc/{pid}/io', seen)
+        if io:
+            read_bytes, write_bytes = parse_io(io)
+            metrics['io_read_mb'] = read_bytes / (1024 * 1024)
+            metrics['io_write_mb'] = write_bytes / (1024 * 1024)
+        else:
+            metrics['io_read_mb'] = metrics['io_write_mb'] = None
+        if expensive:
+            # Read rarely, so not worth keeping a descriptor open for
+            try:
+                with open(f'/proc/{pid}/smaps_rollup', 'rb') as f:
+                    uss, pss = parse_smaps_rollup(f.read())
+                metrics['uss_mb'] = uss / (1024 * 1024)
+                metrics['pss_mb'] = pss / (1024 * 1024)
+            except OSError:
+                metrics['uss_mb'] = metrics['pss_mb'] = None
+        return metrics
+
+    def close(self):
+        for path in list(self._fds):
+            self._drop(path)
+
+class CgroupSampler(TreeSampler):
+    """Sample a command's whole cgroup v2 subtree at constant cost
+
+    Each tick reads memory.current, memory.peak, cpu.stat and io.stat of a
+    TransientCgroup through cached descriptors, however many processes the
+    command has spawned. Memory here is the cgroup's charge, which includes
+    page cache and kernel memory, so it reads higher than summed RSS.
+
+    Of the tier metrics a cgroup only knows its task count (pids.current,
+    reported as threads) and its I/O; the rest, and per-process records,
+    would need the tree walk this sampler exists to avoid.
+    """
+
+    def __init__(self, cgroup, **options):
+        super().__init__(**options)
+        self.cgroup = cgroup
+        self.io_read_bytes = 0
+        self.io_write_bytes = 0
+        self._fds = {}
+
+    def _read(self, name):
+        fd = self._fds.get(name)
+        try:
+            if fd is None:
+                fd = os.open(os.path.join(self.cgroup.path, name), os.O_RDONLY)
+                self._fds[name] = fd
+            return os.pread(fd, 65536, 0)
+        except OSError:
+            return None
+
+    def sample(self):
+        """Return (cpu_percent, memory_bytes) for the whole cgroup"""
+        now = time.monotonic()
+        current = self._read('memory.current')
+        cpu_stat = self._read('cpu.stat')
+        if current is None or cpu_stat is None:
+            raise psutil.NoSuchProcess(0, msg=f"cgroup {self.cgroup.path} is gone")
+        total_mem = int(current)
+
+        # memory.peak only exists from Linux 5.19 on
+        peak = self._read('memory.peak')
+        self.peak_hwm = max(self.peak_hwm, int(peak) if peak else total_mem)
+
+        usage_usec = 0
+        for line in cpu_stat.split(b'\n'):
+            if line.startswith(b'usage_usec '):
+                usage_usec = int(line.split()[1])
+                break
+
+        io_stat = self._read('io.stat')
+        if io_stat:
+            read_bytes = write_bytes = 0
+            for field in io_stat.split():
+                if field.startswith(b'rbytes='):
+                    read_bytes += int(field[7:])
+                elif field.startswith(b'wbytes='):
+                    write_bytes += int(field[7:])
+            self.io_read_bytes, self.io_write_bytes = read_bytes, write_bytes
+
+        if self.metrics:
+            tasks = self._read('pids.current')
+            self.extra['threads'] = int(tasks) if tasks else float('nan')
+            if io_stat:
+                self.extra['io_read_mb'] = self.io_read_bytes / (1024 * 1024)
+                self.extra['io_write_mb'] = self.io_write_bytes / (1024 * 1024)
+
+        return self._account_cpu(usage_usec / 1e6, now), total_mem
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+def make_sampler(name, process, cgroup=None, **options):
+    """Create the sampler backend called name for a psutil.Process
+
+    The cgroup backend needs the TransientCgroup the process was launched
+    in; without one it falls back to walking the process tree like auto.
+    options (tier, per_process, expensive_every, hwm_every) go to TreeSampler.
+    """
+    if name == 'cgroup':
+        if cgroup is not None:
+            if options.get('per_process'):
+                print("The cgroup sampler does not see individual processes; no per-process rows will be written")
+            return CgroupSampler(cgroup, **options)
+        name = 'auto'
+    if name in ('auto', 'procfs'):
+        if ProcfsSampler.available(process.pid):
+            return ProcfsSampler(process.pid, **options)
+        if name == 'procfs':
+            print("procfs sampler unavailable on this system, falling back to psutil")
+    return PsutilSampler(process, **options)
@@ -0,0 +1,135 @@
+import time
+
+from .sampler import CLOCK_TICKS
+
+class DeadlineScheduler:
+    """Fire ticks on a fixed monotonic grid of start + k * interval
+
+    Sampling cost does not stretch the period, and when a tick overruns
+    the grid the missed deadlines are skipped rather than fired back to
+    back to catch up.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = time.monotonic()
+        self.next_deadline = self.start
+        self.missed = 0
+
+    def wait(self, stop=None):
+        """Sleep until the next deadline, skipping any that already passed
+
+        With a threading.Event as stop, return early once it is set; the
+        return value is whether it was.
+        """
+        self.next_deadline += self.interval
+        now = time.monotonic()
+        if now > self.next_deadline:
+            behind = int((now - self.next_deadline) // self.interval) + 1
+            self.missed += behind
+            self.next_deadline += behind * self.interval
+        if stop is not None:
+            return stop.wait(max(0.0, self.next_deadline - now))
+        time.sleep(max(0.0, self.next_deadline - now))
+        return False
+
+class OverheadBudget:
+    """Measure the monitor's own CPU use and keep it under a budget
+
+    The monitor's CPU time (all of its threads, via time.process_time) is
+    read once per tick. With max_overhead set, as a percentage of one core,
+    the scheduler interval is stretched to at least the smoothed CPU cost
+    of a tick divided by the budget, and relaxed back towards base_interval
+    (the interval the loop asked for) when sampling gets cheaper again.
+    """
+
+    def __init__(self, scheduler, max_overhead=None, smoothing=0.2):
+        self.scheduler = scheduler
+        self.base_interval = scheduler.interval
+        self.max_overhead = max_overhead
+        self.smoothing = smoothing
+        self.max_stretched = 0.0
+        self.tick_cost = None
+        self._first = True
+        self._start_cpu = self._last_cpu = time.process_time()
+        self._start_wall = self._last_wall = time.monotonic()
+
+    def update(self):
+        """Account the last tick and return the monitor's CPU percent over it
+
+        The first call only starts the measurement and returns NaN: since
+        construction the monitor has mostly been setting up (creating the
+        sampler, starting the writer thread), which says nothing about what
+        sampling costs.
+        """
+        cpu = time.process_time()
+        wall = time.monotonic()
+        cost = cpu - self._last_cpu
+        percent = cost / (wall - self._last_wall) * 100 if wall > self._last_wall else 0.0
+        self._last_cpu, self._last_wall = cpu, wall
+
+        if self._first:
+            self._first = False
+            self.scheduler.interval = self.base_interval
+            return float('nan')
+        if self.tick_cost is None:
+            self.tick_cost = cost
+        else:
+            self.tick_cost += self.smoothing * (cost - self.tick_cost)
+        interval = self.base_interval
+        if self.max_overhead:
+            interval = max(interval, self.tick_cost / (self.max_overhead / 100))
+            if interval > self.base_interval:
+                if interval > self.max_stretched * 1.5:
+                    print(f"Monitor overhead above {self.max_overhead:g}% budget: stretching interval from {self.base_interval:g}s to {interval:.3g}s")
+                self.max_stretched = max(self.max_stretched, interval)
+        self.scheduler.interval = interval
+        return percent
+
+    @property
+    def cpu_seconds(self):
+        return time.process_time() - self._start_cpu
+
+    def report(self):
+        """Print the monitor's total CPU use and whether the budget was enforced"""
+        wall = time.monotonic() - self._start_wall
+        percent = self.cpu_seconds / wall * 100 if wall > 0 else 0.0
+        print(f"Monitor overhead: {self.cpu_seconds:.3f} CPU-seconds ({percent:.2f}% of one core)")
+        if self.max_stretched:
+            print(f"Interval was stretched up to {self.max_stretched:.3g}s to stay within the {self.max_overhead:g}% overhead budget")
+
+class AdaptiveInterval:
+    """Sample faster while memory or CPU are moving and slower while they are flat
+
+    After each sample the interval is halved (down to min_interval) if RSS
+    moved by more than mem_threshold of its previous value or CPU moved by
+    more than cpu_threshold percentage points, and grown by a quarter (up
+    to max_interval) otherwise.
+
+    CPU percentages come from clock-tick counters, so over a short interval
+    a steady load reads a whole tick more or less from one sample to the
+    next: 100 / (CLOCK_TICKS * interval) points, 100 at 0.01 s. The CPU
+    threshold is raised to two such steps, so that flat CPU counts as flat
+    however short the interval.
+    """
+
+    def __init__(self, interval, min_interval, max_interval, mem_threshold=0.05, cpu_threshold=10.0):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.mem_threshold = mem_threshold
+        self.cpu_threshold = cpu_threshold
+        self._last = None
+
+    def update(self, cpu_percent, memory_mb):
+        """Account a sample and return the interval until the next one"""
+        if self._last is not None:
+            last_cpu, last_memory = self._last
+            mem_change = abs(memory_mb - last_memory) / max(last_memory, 1.0)
+            cpu_threshold = max(self.cpu_threshold, 2 * 100 / (CLOCK_TICKS * self.interval))
+            if mem_change > self.mem_threshold or abs(cpu_percent - last_cpu) > cpu_threshold:
+                self.interval = max(self.min_interval, self.interval / 2)
+            else:
+                self.interval = min(self.max_interval, self.interval * 1.25)
+        self._last = (cpu_percent, memory_mb)
+        return self.interval
@@ -0,0 +1,201 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+from .writer import RowWriter
+
+# A segmented output is a JSON manifest next to numbered CSV segments:
+# {"segments_version": 1, "columns": [...], "labels": [...], "compression":
+# "gzip", "rotate_bytes": ..., "rotate_seconds": ..., "segments": [{"path":
+# "run.000000.csv.gz", "rows": N, "first": ..., "last": ..., "complete":
+# true}, ...]}. Each segment is a self-contained CSV with its own header;
+# first and last are the first column (timestamp or seconds_elapsed) of its
+# first and last row, so a time window only has to open the segments that
+# overlap it.
+MANIFEST_SUFFIX = '.manifest.json'
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+EXTENSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+def manifest_path(output_file):
+    """The manifest path for an --output of a segmented monitor"""
+    if output_file.endswith(MANIFEST_SUFFIX):
+        return output_file
+    return f"{os.path.splitext(output_file)[0]}{MANIFEST_SUFFIX}"
+
+def is_manifest(path):
+    return path.endswith(MANIFEST_SUFFIX)
+
+def zstandard_available():
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def read_manifest(path):
+    with open(path) as f:
+        return json.load(f)
+
+def write_manifest(path, manifest):
+    """Replace the manifest atomically, so readers never see half of it"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+def write_manifest_header(path, columns, labels=(), compression='none', rotate_bytes=None, rotate_seconds=None):
+    """Create a segmented output holding no segments yet"""
+    write_manifest(path, {
+        'segments_version': 1,
+        'columns': list(columns),
+        'labels': list(labels),
+        'compression': compression,
+        'rotate_bytes': rotate_bytes,
+        'rotate_seconds': rotate_seconds,
+        'segments': [],
+    })
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+class SegmentWriter(RowWriter):
+    """RowWriter that streams compressed CSV segments and rotates them by size or age
+
+    Settings come from the manifest created by write_manifest_header. Each
+    writer starts a new segment, so the repeated trials of a comparison
+    append segments to one manifest. The manifest is rewritten whenever a
+    segment starts or ends; flushes use the compressor's sync flush, so an
+    open segment is readable up to its last flush.
+    """
+
+    size_check_rows = 64
+
+    def _open(self):
+        self._manifest = read_manifest(self.output_file)
+        self._directory = os.path.dirname(os.path.abspath(self.output_file))
+        self._segment = None
+        return self
+
+    def _start_segment(self):
+        compression = self._manifest['compression']
+        index = len(self._manifest['segments'])
+        base = os.path.basename(self.output_file)[:-len(MANIFEST_SUFFIX)]
+        name = f"{base}.{index:06d}.csv{EXTENSIONS[compression]}"
+        self._raw = open(os.path.join(self._directory, name), 'wb')
+        if compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        elif compression == 'zstd':
+            import zstandard
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = None
+        self._text = io.TextIOWrapper(self._stream or self._raw, newline='', write_through=False)
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(self._manifest['columns'])
+        self._segment = {'path': name, 'rows': 0, 'first': None, 'last': None, 'complete': False}
+        self._manifest['segments'].append(self._segment)
+        self._started = time.monotonic()
+        write_manifest(self.output_file, self._manifest)
+
+    def _end_segment(self):
+        self._text.flush()
+        self._text.detach()
+        if self._stream is not None:
+            self._stream.close()
+        self._raw.close()
+        self._segment['complete'] = True
+        write_manifest(self.output_file, self._manifest)
+        self._segment = None
+
+    def _due(self):
+        rotate_seconds = self._manifest['rotate_seconds']
+        if rotate_seconds and time.monotonic() - self._started >= rotate_seconds:
+            return True
+        rotate_bytes = self._manifest['rotate_bytes']
+        if rotate_bytes and self._segment['rows'] % self.size_check_rows == 0:
+            return self._raw.tell() >= rotate_bytes
+        return False
+
+    def _write(self, f, row):
+        if self._segment is None:
+            self._start_segment()
+        row = [_json_value(v) for v in row]
+        self._csv.writerow(row)
+        segment = self._segment
+        if segment['first'] is None:
+            segment['first'] = row[0]
+        segment['last'] = row[0]
+        segment['rows'] += 1
+        if self._due():
+            self._end_segment()
+
+    def flush(self):
+        if self._segment is not None:
+            # Reaches the compressor's sync flush through the text wrapper
+            self._text.flush()
+            write_manifest(self.output_file, self._manifest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._segment is not None:
+            self._end_segment()
+
+def read_segment(path, compression):
+    """Decompressed bytes of a segment up to its last complete line
+
+    A segment that is still being written lacks the end of its compressed
+    stream, so it is decoded incrementally rather than with gzip.open.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if compression == 'gzip':
+        decoder = zlib.decompressobj(wbits=31)
+        data = decoder.decompress(data)
+    elif compression == 'zstd':
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data[:data.rfind(b'\n') + 1]
+
+def window_parser(columns):
+    """Parse a --from/--to bound for data whose first column is columns[0]"""
+    import pandas as pd
+
+    return pd.Timestamp if columns[0] == 'timestamp' else float
+
+def _overlaps(segment, start, end, parse):
+    if segment['first'] is None:
+        return False
+    return (end is None or parse(segment['first']) <= end) and (start is None or parse(segment['last']) >= start)
+
+def load_segments(path, start=None, end=None):
+    """Load the rows of a segmented output, opening only segments that overlap [start, end]
+
+    start and end are strings compared against the first column: dates
+    for timestamps, seconds for seconds_elapsed. Rows are not filtered
+    here, only segments.
+    """
+    import pandas as pd
+
+    manifest = read_manifest(path)
+    columns = manifest['columns']
+    parse = window_parser(columns)
+    start = None if start is None else parse(start)
+    end = None if end is None else parse(end)
+    directory = os.path.dirname(os.path.abspath(path))
+    frames = []
+    for segment in manifest['segments']:
+        if not _overlaps(segment, start, end, parse):
+            continue
+        data = read_segment(os.path.join(directory, segment['path']), manifest['compression'])
+        if data.count(b'\n') > 1:
+            frames.append(pd.read_csv(io.BytesIO(data)))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
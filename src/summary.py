@@ -0,0 +1,113 @@
+import csv
+import statistics
+
+SUMMARY_METRICS = [
+    ('peak_rss_mb', 'Peak RSS (MB)'),
+    ('peak_hwm_mb', 'Peak HWM (MB)'),
+    ('maxrss_mb', 'Max RSS (MB)'),
+    ('mean_cpu_percent', 'Mean CPU (%)'),
+    ('cpu_seconds', 'CPU time (s)'),
+    ('wall_seconds', 'Wall time (s)'),
+    ('mem_time_mb_s', 'Memory-time (MB*s)'),
+]
+
+class RunStats:
+    """Summary metrics of one monitored run, accumulated tick by tick
+
+    peak_rss_mb is the largest sampled tree RSS. peak_hwm_mb is the largest
+    kernel high-water mark (VmHWM) of any single process in the tree and
+    maxrss_mb is ru_maxrss from wait4 on the launched command; both catch
+    spikes that fall between samples. cpu_seconds is the command's total
+    CPU time from wait4 when available, otherwise the sampler's cumulative
+    count; either way it includes children that exited between samples.
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.peak_rss_mb = 0.0
+        self.peak_hwm_mb = 0.0
+        self.maxrss_mb = 0.0
+        self.sampled_cpu_seconds = 0.0
+        self.rusage_cpu_seconds = None
+        self.cpu_total = 0.0
+        self.cpu_time_integral = 0.0
+        self.duration = 0.0
+        self.mem_time_mb_s = 0.0
+        self.wall_seconds = 0.0
+        self._last = None
+
+    def add(self, elapsed_seconds, cpu_percent, memory_mb):
+        """Account one sample"""
+        if self._last is not None:
+            # Trapezoidal integrals over time, so uneven sampling intervals weigh correctly
+            last_elapsed, last_cpu, last_memory = self._last
+            dt = elapsed_seconds - last_elapsed
+            self.mem_time_mb_s += dt * (memory_mb + last_memory) / 2
+            self.cpu_time_integral += dt * (cpu_percent + last_cpu) / 2
+            self.duration += dt
+        self._last = (elapsed_seconds, cpu_percent, memory_mb)
+        self.samples += 1
+        self.peak_rss_mb = max(self.peak_rss_mb, memory_mb)
+        self.cpu_total += cpu_percent
+
+    @property
+    def peak_memory_mb(self):
+        """The largest of the sampled tree peak, peak_hwm_mb and maxrss_mb
+
+        Only maxrss_mb is exact: peak_hwm_mb is read when a sample lands, so
+        it misses a command shorter than one interval and children that
+        exit between samples, whereas wait4 reports the peak of the command
+        and every descendant it reaped. ru_maxrss also counts the forked
+        monitor image before exec, so this never reads below the monitor's
+        own RSS and regressions under that floor go unseen.
+        """
+        return max(self.peak_rss_mb, self.peak_hwm_mb, self.maxrss_mb)
+
+    @property
+    def cpu_seconds(self):
+        if self.rusage_cpu_seconds is not None:
+            return self.rusage_cpu_seconds
+        return self.sampled_cpu_seconds
+
+    @property
+    def mean_cpu_percent(self):
+        """Time-weighted mean CPU, or the plain mean when all samples share an instant"""
+        if self.duration > 0:
+            return self.cpu_time_integral / self.duration
+        return self.cpu_total / self.samples if self.samples else 0.0
+
+def median_iqr(values):
+    """Return (median, interquartile range) of values"""
+    if len(values) < 2:
+        return (values[0] if values else 0.0), 0.0
+    q1, median, q3 = statistics.quantiles(values, n=4, method='inclusive')
+    return median, q3 - q1
+
+def summarize(trials):
+    """Summary rows from {label: [RunStats, ...]}, one row per label"""
+    rows = []
+    for label, runs in trials.items():
+        row = {'command': label, 'trials': len(runs)}
+        for metric, _ in SUMMARY_METRICS:
+            median, iqr = median_iqr([getattr(run, metric) for run in runs])
+            row[f'{metric}_median'] = median
+            row[f'{metric}_iqr'] = iqr
+        rows.append(row)
+    return rows
+
+def print_summary(rows):
+    """Print summary rows as a table of median ± IQR"""
+    headers = ['Command', 'Trials'] + [title for _, title in SUMMARY_METRICS]
+    table = [[row['command'], str(row['trials'])] + [
+        f"{row[f'{metric}_median']:.2f} ± {row[f'{metric}_iqr']:.2f}" for metric, _ in SUMMARY_METRICS
+    ] for row in rows]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *table)]
+    for line in [headers] + table:
+        print('  '.join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+def write_summary(path, rows):
+    """Write summary rows to a CSV file"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
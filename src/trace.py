@@ -0,0 +1,146 @@
+import json
+import struct
+from datetime import datetime, timedelta
+
+from .writer import RowWriter
+
+# Writing a trace needs only the standard library so that the monitor stays
+# lean; numpy and pandas are imported by the reading functions that use them.
+
+# Binary trace layout: MAGIC, a little-endian uint32 header length, a JSON
+# header {"columns": [...], "dtypes": [...], "labels": [...]} padded with
+# spaces to a multiple of 64 bytes, then fixed-width little-endian records.
+# Timestamps are int64 nanoseconds of the local wall clock, the command
+# column is an int64 index into labels, trial and pid are int64 and every
+# other column is float64.
+MAGIC = b'PPTRACE1'
+HEADER_ALIGN = 64
+EPOCH = datetime(1970, 1, 1)
+
+def column_dtype(column):
+    """Binary dtype code for a column of the CSV schema"""
+    return 'i8' if column in ('timestamp', 'command', 'trial', 'pid') else 'f8'
+
+def is_trace(path):
+    """Whether path starts with the binary trace magic"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def write_trace_header(path, columns, labels=()):
+    """Create a binary trace file holding only the header"""
+    header = json.dumps({
+        'columns': list(columns),
+        'dtypes': [column_dtype(c) for c in columns],
+        'labels': list(labels),
+    }).encode()
+    prefix = len(MAGIC) + 4
+    padded = -(-(prefix + len(header)) // HEADER_ALIGN) * HEADER_ALIGN - prefix
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', padded) + header.ljust(padded))
+
+def read_trace_header(path):
+    """Return (header dict, byte offset of the first record)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a binary trace")
+        length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 4 + length
+
+def record_dtype(header):
+    import numpy as np
+
+    return np.dtype([(c, '<' + d) for c, d in zip(header['columns'], header['dtypes'])])
+
+def open_trace(path):
+    """Map the records of a binary trace without copying them
+
+    Returns (header, records) where records is a read-only structured
+    numpy.memmap. A trailing partial record from an interrupted writer is
+    ignored.
+    """
+    import numpy as np
+
+    header, offset = read_trace_header(path)
+    dtype = record_dtype(header)
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        count = (f.tell() - offset) // dtype.itemsize
+    if count == 0:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+def trace_to_dataframe(path):
+    """Load a binary trace as a DataFrame with the CSV schema"""
+    header, records = open_trace(path)
+    return records_to_dataframe(header, records)
+
+def records_to_dataframe(header, records):
+    """Wrap trace records in a DataFrame with the CSV schema"""
+    import pandas as pd
+
+    data = {}
+    for column in header['columns']:
+        values = records[column]
+        if column == 'timestamp':
+            values = pd.to_datetime(values, unit='ns')
+        elif column == 'command':
+            values = pd.Categorical.from_codes(values, header['labels'])
+        data[column] = values
+    return pd.DataFrame(data, copy=False)
+
+def csv_to_trace(csv_file, trace_file):
+    """Convert a metrics CSV into a binary trace"""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(csv_file, float_precision='round_trip')
+    labels = list(pd.unique(df['command'])) if 'command' in df.columns else []
+    write_trace_header(trace_file, df.columns, labels)
+    header, _ = read_trace_header(trace_file)
+    records = np.empty(len(df), dtype=record_dtype(header))
+    for column in df.columns:
+        if column == 'timestamp':
+            # isoformat leaves out whole-second microseconds, which trips pandas' format inference
+            records[column] = pd.to_datetime(df[column].map(datetime.fromisoformat)).to_numpy(dtype='datetime64[ns]').view('i8')
+        elif column == 'command':
+            records[column] = pd.Categorical(df[column], categories=labels).codes
+        else:
+            records[column] = df[column]
+    with open(trace_file, 'ab') as f:
+        records.tofile(f)
+    return len(records)
+
+def trace_to_csv(trace_file, csv_file):
+    """Convert a binary trace back into a metrics CSV"""
+    df = trace_to_dataframe(trace_file)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = df['timestamp'].map(datetime.isoformat)
+    df.to_csv(csv_file, index=False)
+    return len(df)
+
+class TraceWriter(RowWriter):
+    """RowWriter that appends fixed-width records to a binary trace"""
+
+    def _open(self):
+        header, _ = read_trace_header(self.output_file)
+        self._labels = {label: i for i, label in enumerate(header['labels'])}
+        self._columns = header['columns']
+        self._record = struct.Struct('<' + ''.join('q' if d == 'i8' else 'd' for d in header['dtypes']))
+        return open(self.output_file, 'ab')
+
+    def _encode(self, row):
+        values = []
+        for column, value in zip(self._columns, row):
+            if column == 'timestamp':
+                value = (value - EPOCH) // timedelta(microseconds=1) * 1000
+            elif column == 'command':
+                value = self._labels[value]
+            values.append(value)
+        return self._record.pack(*values)
+
+    def _write(self, f, row):
+        f.write(self._encode(row))
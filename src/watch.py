@@ -0,0 +1,208 @@
+import io
+import os
+import time
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from .downsample import auto_max_points, downsample_indices
+from .trace import is_trace, open_trace, records_to_dataframe
+
+class TailReader:
+    """Read only the rows appended to a metrics file since the last call
+
+    CSV files are tracked by byte offset and only complete lines are
+    parsed; binary traces are tracked by record count and the new records
+    are sliced out of the memory map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.binary = is_trace(path)
+        self.columns = None
+        self.offset = 0
+        self.count = 0
+
+    def truncated(self):
+        """Whether the file shrank, i.e. it was rewritten from scratch"""
+        try:
+            return os.path.getsize(self.path) < self.offset
+        except OSError:
+            return True
+
+    def read_new(self):
+        """Return a DataFrame of rows appended since the last call, or None"""
+        if self.binary:
+            return self._read_trace()
+        return self._read_csv()
+
+    def _read_trace(self):
+        header, records = open_trace(self.path)
+        self.columns = header['columns']
+        self.offset = os.path.getsize(self.path)
+        if len(records) <= self.count:
+            return None
+        new = records[self.count:]
+        self.count = len(records)
+        return records_to_dataframe(header, new)
+
+    def _read_csv(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None
+        lines = data[:end]
+        if self.columns is None:
+            header_end = lines.index(b'\n') + 1
+            self.columns = lines[:header_end].decode().strip().split(',')
+            lines = lines[header_end:]
+        self.offset += end
+        if not lines.strip():
+            return None
+        df = pd.read_csv(io.BytesIO(lines), header=None, names=self.columns)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
+
+class _Series:
+    """Growable x/y buffers for one plotted line"""
+
+    def __init__(self):
+        self.x = np.empty(1024)
+        self.y = np.empty(1024)
+        self.size = 0
+
+    def extend(self, x, y):
+        needed = self.size + len(x)
+        if needed > len(self.x):
+            capacity = max(needed, 2 * len(self.x))
+            self.x = np.resize(self.x, capacity)
+            self.y = np.resize(self.y, capacity)
+        self.x[self.size:needed] = x
+        self.y[self.size:needed] = y
+        self.size = needed
+
+class WatchPlot:
+    """A figure that stays open across refreshes and grows its lines in place
+
+    Mirrors the layout of render_single_plot and render_comparison_plot,
+    but new rows only extend the existing Line2D data instead of building a
+    new figure.
+    """
+
+    colors = ['blue', 'red', 'green', 'orange', 'purple']
+
+    def __init__(self, comparison, downsample='minmax', max_points=None):
+        self.comparison = comparison
+        self.downsample = downsample
+        self.series = {}
+        self.lines = {}
+        self.command_colors = {}
+        self.rows = 0
+        self.mem_max = 0.0
+        if comparison:
+            self.fig, self.ax = plt.subplots(figsize=(14, 8))
+            self.ax.set_xlabel('Time (seconds since process start)')
+            self.ax.grid(True, alpha=0.3)
+            self.ax.set_title('Memory Usage Comparison')
+        else:
+            self.fig, self.ax = plt.subplots(figsize=(12, 8))
+            self.ax.xaxis_date()
+            self.ax.set_xlabel('Timestamp')
+            self.ax.set_title('Process Memory Usage')
+            self.fig.autofmt_xdate()
+        self.max_points = max_points or auto_max_points(self.fig.get_figwidth(), 300)
+
+    def extend(self, df):
+        """Append the rows of df to the plotted lines"""
+        if self.comparison:
+            keys = ['command', 'trial'] if 'trial' in df.columns else ['command']
+            for key, group in df.groupby(keys, sort=False, observed=True):
+                self._extend(key, group['seconds_elapsed'].to_numpy(), group['memory_mb'].to_numpy())
+        elif 'pid' in df.columns:
+            for pid, group in df.groupby('pid', sort=False):
+                self._extend(pid, mdates.date2num(group['timestamp'].to_numpy()), group['memory_mb'].to_numpy())
+        else:
+            self._extend(None, mdates.date2num(df['timestamp'].to_numpy()), df['memory_mb'].to_numpy())
+        self.rows += len(df)
+        self.mem_max = max(self.mem_max, df['memory_mb'].max())
+
+    def _extend(self, key, x, y):
+        if key not in self.series:
+            self.series[key] = _Series()
+            if self.comparison:
+                # Repeated trials share their command's color and legend entry
+                command = key[0]
+                if command not in self.command_colors:
+                    self.command_colors[command] = self.colors[len(self.command_colors) % len(self.colors)]
+                    label = command
+                else:
+                    label = None
+                self.lines[key], = self.ax.plot([], [], color=self.command_colors[command], label=label, linewidth=2)
+                self.ax.legend()
+            elif key is not None:
+                # Multi-process monitoring draws one line per monitored PID
+                color = self.colors[len(self.lines) % len(self.colors)]
+                self.lines[key], = self.ax.plot([], [], color=color, label=f'PID {key}', linewidth=2)
+                self.ax.legend()
+            else:
+                self.lines[key], = self.ax.plot([], [], 'b-', linewidth=2)
+        self.series[key].extend(x, y)
+
+    def save(self, output_file):
+        """Redraw with the current data and write the PNG"""
+        # Convert MB to GB for better readability if values are large
+        scale_factor = 1024 if self.mem_max > 1000 else 1
+        mem_unit = 'GB' if scale_factor > 1 else 'MB'
+        for key, series in self.series.items():
+            x, y = series.x[:series.size], series.y[:series.size]
+            keep = downsample_indices(x, y, self.downsample, self.max_points)
+            self.lines[key].set_data(x[keep], y[keep] / scale_factor)
+        if self.comparison:
+            self.ax.set_ylabel(f'Memory ({mem_unit})')
+        else:
+            self.ax.set_ylabel(f'Memory ({mem_unit})', color='b')
+            self.ax.tick_params(axis='y', labelcolor='b')
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.fig.tight_layout()
+        self.fig.savefig(output_file, dpi=300, bbox_inches='tight')
+
+    def close(self):
+        plt.close(self.fig)
+
+def watch_render(input_file, output_file, downsample='minmax', max_points=None, period=1.0):
+    """Re-render output_file whenever rows are appended to input_file"""
+    reader = None
+    plot = None
+    while True:
+        if not os.path.exists(input_file):
+            print(f"Waiting for CSV file: {input_file}")
+        else:
+            if reader is not None and reader.truncated():
+                print("Input file was rewritten, starting over")
+                if plot is not None:
+                    plot.close()
+                reader = plot = None
+            if reader is None:
+                reader = TailReader(input_file)
+            try:
+                df = reader.read_new()
+            except (pd.errors.EmptyDataError, pd.errors.ParserError, ValueError):
+                df = None
+                print("Waiting for valid data...")
+            if df is not None and len(df) > 0:
+                if plot is None:
+                    plot = WatchPlot('command' in reader.columns, downsample, max_points)
+                plot.extend(df)
+                if plot.rows >= 2:
+                    plot.save(output_file)
+                    kind = "Comparison plot" if plot.comparison else "Plot"
+                    print(f"{kind} updated: {output_file}")
+            elif plot is None or plot.rows < 2:
+                print("Waiting for more data...")
+        time.sleep(period)
@@ -0,0 +1,92 @@
+import csv
+import queue
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+class RowWriter:
+    """Append CSV rows from a dedicated writer thread
+
+    The sampling thread only enqueues rows into a bounded queue, so slow
+    storage never delays a tick. The writer thread flushes after
+    flush_every rows, after flush_ms milliseconds with unflushed rows, and
+    on close. If the queue is full the row is dropped and counted rather
+    than blocking the sampler. If a write fails (a full disk, say), the
+    error is kept in error, later rows are dropped, and close reports it.
+    """
+
+    def __init__(self, output_file, flush_every=100, flush_ms=1000, max_queue=10000):
+        self.output_file = output_file
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_ms / 1000
+        self.dropped = 0
+        self.max_backlog = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def writerow(self, row):
+        """Queue a row for writing without blocking"""
+        if self.error is not None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.max_backlog = max(self.max_backlog, self._queue.qsize())
+
+    def _open(self):
+        f = open(self.output_file, 'a', newline='')
+        self._csv = csv.writer(f)
+        return f
+
+    def _write(self, f, row):
+        self._csv.writerow([v.isoformat() if isinstance(v, datetime) else v for v in row])
+
+    def _run(self):
+        try:
+            self._write_rows()
+        except Exception as e:
+            self.error = e
+
+    def _write_rows(self):
+        with self._open() as f:
+            pending = 0
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    row = None
+                if row is _STOP:
+                    break
+                if row is not None:
+                    self._write(f, row)
+                    pending += 1
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if pending and (pending >= self.flush_every or time.monotonic() >= deadline):
+                    f.flush()
+                    pending = 0
+                    deadline = None
+
+    def close(self):
+        """Write out every queued row, flush and stop the writer thread"""
+        # A dead writer thread never drains the queue, so never block on a full one
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+        if self.error is not None:
+            print(f"Writing {self.output_file} failed: {self.error}; samples after the failure were not written")
+        elif self.dropped:
+            print(f"Writer could not keep up: dropped {self.dropped} samples (peak backlog {self.max_backlog} rows)")
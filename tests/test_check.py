@@ -0,0 +1,84 @@
+import math
+
+from src.check import check_against_baseline, compare_metric, new_baseline, record_trials, regressed
+from src.summary import RunStats
+
+def run_stats(peak_rss_mb=10.0, peak_hwm_mb=0.0, maxrss_mb=0.0, cpu_seconds=1.0, wall_seconds=1.0, mem_time_mb_s=10.0):
+    run = RunStats()
+    run.peak_rss_mb = peak_rss_mb
+    run.peak_hwm_mb = peak_hwm_mb
+    run.maxrss_mb = maxrss_mb
+    run.rusage_cpu_seconds = cpu_seconds
+    run.wall_seconds = wall_seconds
+    run.mem_time_mb_s = mem_time_mb_s
+    return run
+
+def test_compare_metric_within_tolerance_is_ok():
+    result = compare_metric('cpu_seconds', [1.0, 1.01, 0.99], [1.05, 1.04, 1.06], 20.0, 0.05, 0.05)
+    assert result['status'] == 'ok'
+    assert math.isclose(result['change'], 5.0)
+
+def test_compare_metric_regression_needs_tolerance_and_floor():
+    # 50% over, but only 0.01 s over a 0.05 s floor
+    assert compare_metric('cpu_seconds', [0.02] * 3, [0.03] * 3, 20.0, 0.05, 0.05)['status'] == 'ok'
+    assert compare_metric('cpu_seconds', [1.0] * 3, [1.5] * 3, 20.0, 0.05, 0.05)['status'] == 'REGRESSED'
+
+def test_compare_metric_without_enough_trials_skips_the_test():
+    # Two trials a side can reach p = 1/6 at best, never 0.05
+    result = compare_metric('cpu_seconds', [1.0, 1.0], [2.0, 2.0], 20.0, 0.05, 0.05)
+    assert result['p_value'] is None
+    assert result['status'] == 'REGRESSED'
+
+def test_compare_metric_overlapping_trials_are_noisy():
+    result = compare_metric('cpu_seconds', [1.0, 1.0, 1.0, 3.0, 3.0], [1.0, 3.0, 3.0, 3.0, 1.0], 20.0, 0.05, 0.05)
+    assert result['p_value'] > 0.05
+    assert result['status'] == 'noisy'
+
+def test_compare_metric_separated_trials_regress_with_p_value():
+    result = compare_metric('cpu_seconds', [1.0, 1.1, 0.9, 1.05, 0.95], [2.0, 2.1, 1.9, 2.05, 1.95], 20.0, 0.05, 0.05)
+    assert result['p_value'] == 1 / math.comb(10, 5)
+    assert result['status'] == 'REGRESSED'
+
+def test_compare_metric_improvement():
+    assert compare_metric('cpu_seconds', [2.0] * 3, [1.0] * 3, 20.0, 0.05, 0.05)['status'] == 'improved'
+
+def test_compare_metric_from_zero_baseline():
+    result = compare_metric('cpu_seconds', [0.0] * 3, [1.0] * 3, 20.0, 0.05, 0.05)
+    assert math.isinf(result['change'])
+    assert result['status'] == 'REGRESSED'
+
+def test_check_against_baseline_passes_unchanged_runs():
+    baseline = new_baseline()
+    record_trials(baseline, 'a', 'true', [run_stats() for _ in range(5)])
+    results, notes = check_against_baseline(baseline, {'a': [run_stats() for _ in range(5)]})
+    assert len(results) == 4
+    assert regressed(results) == []
+    assert notes == []
+
+def test_check_against_baseline_catches_peak_only_wait4_saw():
+    # Samples and VmHWM both missed the allocation; only ru_maxrss has it
+    baseline = new_baseline()
+    record_trials(baseline, 'a', 'cmd', [run_stats(peak_rss_mb=6.3, maxrss_mb=27.0 + i * 0.1) for i in range(5)])
+    current = [run_stats(peak_rss_mb=6.3, maxrss_mb=87.0 + i * 0.1) for i in range(5)]
+    results, _ = check_against_baseline(baseline, {'a': current})
+    assert [(r['command'], r['metric']) for r in regressed(results)] == [('a', 'peak_memory_mb')]
+
+def test_check_against_baseline_tolerance_override():
+    baseline = new_baseline()
+    record_trials(baseline, 'a', 'cmd', [run_stats(cpu_seconds=1.0) for _ in range(5)])
+    current = {'a': [run_stats(cpu_seconds=1.3) for _ in range(5)]}
+    assert regressed(check_against_baseline(baseline, current)[0])
+    assert not regressed(check_against_baseline(baseline, current, tolerances={'cpu_seconds': 50.0})[0])
+
+def test_check_against_baseline_notes_missing_commands_and_metrics():
+    baseline = new_baseline()
+    record_trials(baseline, 'old', 'cmd', [run_stats()])
+    record_trials(baseline, 'a', 'cmd', [run_stats()])
+    del baseline['commands']['a']['trials']['peak_memory_mb']
+    results, notes = check_against_baseline(baseline, {'a': [run_stats()], 'new': [run_stats()]})
+    assert {r['command'] for r in results} == {'a'}
+    assert notes == [
+        'a: the baseline has no peak_memory_mb',
+        'new: not in the baseline (run with --update to add it)',
+        'old: in the baseline but not run',
+    ]
@@ -0,0 +1,74 @@
+import numpy as np
+
+from src.downsample import downsample_indices, lttb_indices, minmax_indices
+
+def reference_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets as published, one point at a time"""
+    n = len(y)
+    buckets = threshold - 2
+    bound = lambda i: i * (n - 2) // buckets + 1
+    selected = [0]
+    a = 0
+    for i in range(buckets):
+        if i + 1 < buckets:
+            next_start, next_end = bound(i + 1), bound(i + 2)
+        else:
+            # The last bucket looks ahead to the final point alone
+            next_start, next_end = n - 1, n
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        best, best_area = None, -1.0
+        for j in range(bound(i), bound(i + 1)):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) / 2
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(0)
+    for n, threshold in [(100, 10), (1000, 37), (5003, 500), (64, 63)]:
+        x = np.sort(rng.random(n)) * 100
+        y = np.cumsum(rng.normal(size=n))
+        assert list(lttb_indices(x, y, threshold)) == reference_lttb(list(x), list(y), threshold)
+
+def test_lttb_keeps_first_last_and_budget():
+    x = np.arange(10000.0)
+    y = np.sin(x / 50)
+    keep = lttb_indices(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+
+def test_lttb_short_input_is_untouched():
+    assert list(lttb_indices(np.arange(5.0), np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+
+def test_minmax_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=10007)
+    max_points = 300
+    keep = minmax_indices(y, max_points)
+    assert len(keep) <= max_points
+    assert np.all(np.diff(keep) > 0)
+    buckets = max_points // 2
+    size = -(-len(y) // buckets)
+    kept = set(keep)
+    for start in range(0, len(y), size):
+        chunk = y[start:start + size]
+        assert start + int(chunk.argmin()) in kept
+        assert start + int(chunk.argmax()) in kept
+
+def test_minmax_keeps_a_single_sample_spike():
+    y = np.zeros(100000)
+    y[31337] = 500.0
+    assert 31337 in set(minmax_indices(y, 100))
+
+def test_downsample_modes():
+    x = np.arange(1000.0)
+    y = np.cos(x)
+    assert len(downsample_indices(x, y, 'none', 10)) == 1000
+    assert len(downsample_indices(x, y, 'minmax', 0)) == 1000
+    assert list(downsample_indices(x, y, 'lttb', 50)) == list(lttb_indices(x, y, 50))
+    assert list(downsample_indices(x, y, 'minmax', 50)) == list(minmax_indices(y, 50))
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the monitor entry point in a fresh interpreter and reports what it cost
+# VmHWM starts afresh at exec, unlike ru_maxrss, which keeps the forked
+# image of the (possibly large) test process; ru_maxrss is the fallback
+# where there is no /proc.
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import src.process_plot
+elapsed = time.perf_counter() - start
+try:
+    from src.sampler import parse_hwm
+    with open('/proc/self/status', 'rb') as f:
+        peak = parse_hwm(f.read())
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+print(json.dumps({
+    'seconds': elapsed,
+    'peak_rss_mb': peak / (1024 * 1024),
+    'heavy': sorted(m for m in ('numpy', 'pandas', 'matplotlib') if m in sys.modules),
+}))
+"""
+
+# Generous bounds: importing pandas alone takes longer and more memory than either
+MAX_IMPORT_SECONDS = 0.5
+MAX_RSS_MB = 40
+
+def import_cost():
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+def test_monitor_entry_point_does_not_import_plotting_libraries():
+    assert import_cost()['heavy'] == []
+
+def test_monitor_entry_point_import_is_cheap():
+    cost = import_cost()
+    assert cost['seconds'] < MAX_IMPORT_SECONDS, cost
+    assert cost['peak_rss_mb'] < MAX_RSS_MB, cost
@@ -0,0 +1,104 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from src.process_plot import COMPARE_COLUMNS, MONITOR_COLUMNS, MULTI_MONITOR_COLUMNS
+from src.trace import HEADER_ALIGN, TraceWriter, csv_to_trace, read_trace_header, trace_to_csv, trace_to_dataframe, write_trace_header
+
+START = datetime(2026, 10, 17, 9, 30, 0)
+
+def timestamps(n):
+    # The first has no microseconds, which isoformat writes differently
+    return [(START + timedelta(seconds=0.1 * i, microseconds=7 * i)).isoformat() for i in range(n)]
+
+def floats(rng, n):
+    return rng.random(n) * 1000
+
+def monitor_frame(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({column: floats(rng, n) for column in MONITOR_COLUMNS[1:]})
+    df.insert(0, 'timestamp', timestamps(n))
+    # The first tick has no monitor CPU figure yet
+    df.loc[0, 'monitor_cpu_percent'] = math.nan
+    return df[MONITOR_COLUMNS]
+
+def multi_monitor_frame(n=50, seed=1):
+    df = monitor_frame(n, seed)
+    df['pid'] = np.where(np.arange(n) % 2, 4242, 17)
+    return df[MULTI_MONITOR_COLUMNS]
+
+def compare_frame(n=50, seed=2):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({column: floats(rng, n) for column in COMPARE_COLUMNS})
+    df['command'] = np.where(np.arange(n) < n // 2, 'sleep 1', 'python -c "x=1, 2"')
+    df['trial'] = np.arange(n) % 3 + 1
+    df.loc[[0, n // 2], 'monitor_cpu_percent'] = math.nan
+    return df[COMPARE_COLUMNS]
+
+def read_csv(path):
+    df = pd.read_csv(path, float_precision='round_trip')
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+    return df
+
+def round_trip(tmp_path, df):
+    original = tmp_path / 'original.csv'
+    trace = tmp_path / 'trace.bin'
+    restored = tmp_path / 'restored.csv'
+    df.to_csv(original, index=False)
+    assert csv_to_trace(original, trace) == len(df)
+    assert trace_to_csv(trace, restored) == len(df)
+    return read_csv(original), read_csv(restored)
+
+def test_monitor_csv_round_trip(tmp_path):
+    original, restored = round_trip(tmp_path, monitor_frame())
+    pdt.assert_frame_equal(restored, original)
+    assert math.isnan(restored.loc[0, 'monitor_cpu_percent'])
+
+def test_multi_monitor_csv_round_trip(tmp_path):
+    original, restored = round_trip(tmp_path, multi_monitor_frame())
+    pdt.assert_frame_equal(restored, original)
+
+def test_compare_csv_round_trip(tmp_path):
+    original, restored = round_trip(tmp_path, compare_frame())
+    pdt.assert_frame_equal(restored, original)
+
+def test_trace_header_is_aligned(tmp_path):
+    path = tmp_path / 'trace.bin'
+    write_trace_header(path, COMPARE_COLUMNS, ['a', 'b'])
+    header, offset = read_trace_header(path)
+    assert offset % HEADER_ALIGN == 0
+    assert header['columns'] == COMPARE_COLUMNS
+    assert header['labels'] == ['a', 'b']
+    assert path.stat().st_size == offset
+
+def test_trace_writer_encodes_monitor_rows(tmp_path):
+    path = tmp_path / 'trace.bin'
+    write_trace_header(path, MONITOR_COLUMNS)
+    rows = [[START + timedelta(seconds=i, microseconds=i), 1.5 * i, 100.25 + i, 0.3, math.nan if i == 0 else 0.7, 0.1, 120.0, 0.01 * i] for i in range(20)]
+    writer = TraceWriter(str(path))
+    for row in rows:
+        writer.writerow(row)
+    writer.close()
+    df = trace_to_dataframe(str(path))
+    assert list(df.columns) == MONITOR_COLUMNS
+    assert [t.to_pydatetime() for t in df['timestamp']] == [row[0] for row in rows]
+    expected = np.array([row[1:] for row in rows])
+    np.testing.assert_array_equal(df[MONITOR_COLUMNS[1:]].to_numpy(), expected)
+
+def test_trace_writer_encodes_command_labels(tmp_path):
+    path = tmp_path / 'trace.bin'
+    write_trace_header(path, COMPARE_COLUMNS, ['first', 'second'])
+    rows = [[0.1 * i, 50.0, 10.0 + i, 'second' if i % 2 else 'first', 0.2, i // 2 + 1, math.nan, 0.1, 11.0, 0.5] for i in range(10)]
+    writer = TraceWriter(str(path))
+    for row in rows:
+        writer.writerow(row)
+    writer.close()
+    df = trace_to_dataframe(str(path))
+    assert list(df['command']) == [row[3] for row in rows]
+    assert list(df['trial']) == [row[5] for row in rows]
+    assert df['monitor_cpu_percent'].isna().all()
+    np.testing.assert_array_equal(df['memory_mb'].to_numpy(), [row[2] for row in rows])